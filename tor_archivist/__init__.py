@@ -14,3 +14,89 @@ DISABLE_COMPLETED_ARCHIVING = bool(os.getenv("DISABLE_COMPLETED_ARCHIVING", Fals
 DISABLE_EXPIRED_ARCHIVING = bool(os.getenv("DISABLE_EXPIRED_ARCHIVING", False))
 DISABLE_POST_REMOVAL_TRACKING = bool(os.getenv("DISABLE_POST_REMOVAL_TRACKING", False))
 DISABLE_POST_REPORT_TRACKING = bool(os.getenv("DISABLE_POST_REPORT_TRACKING", False))
+
+# Blossom user info of the bots hardly ever changes, so it's cached on disk to
+# avoid blocking every (re)start on it.
+USER_INFO_CACHE_FILE = os.getenv("USER_INFO_CACHE_FILE", "user_info_cache.json")
+USER_INFO_CACHE_TTL_SEC = int(os.getenv("USER_INFO_CACHE_TTL_SEC", 60 * 60 * 24))
+
+# Running several instances side by side: each one only works on its own share
+# of the submissions, coordinated through a SQLite file they all can reach.
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", 1))
+SHARD_LEASE_FILE = os.getenv("SHARD_LEASE_FILE", "shard_leases.sqlite3")
+SHARD_LEASE_TTL_SEC = int(os.getenv("SHARD_LEASE_TTL_SEC", 5 * 60))
+INSTANCE_ID = os.getenv("INSTANCE_ID", "")
+# Appended to the default names of the files each instance keeps to itself
+_INSTANCE_SUFFIX = f"-{INSTANCE_ID}" if INSTANCE_ID else ""
+
+# Tuning of the bulk engine that drains the expired posts in Clear the Queue mode
+CTQ_PAGE_SIZE = int(os.getenv("CTQ_PAGE_SIZE", 500))
+CTQ_RATELIMIT_RESERVE = int(os.getenv("CTQ_RATELIMIT_RESERVE", 10))
+CTQ_PROGRESS_INTERVAL_SEC = int(os.getenv("CTQ_PROGRESS_INTERVAL_SEC", 10))
+
+# Posts to the archive subreddit go through a persistent queue that is drained
+# at the pace of the posting budget of the account. Every instance needs its
+# own queue; by default the file is named after the INSTANCE_ID.
+ARCHIVE_QUEUE_FILE = os.getenv("ARCHIVE_QUEUE_FILE", f"archive_queue{_INSTANCE_SUFFIX}.sqlite3")
+ARCHIVE_SUBMITS_PER_HOUR = float(os.getenv("ARCHIVE_SUBMITS_PER_HOUR", 60))
+ARCHIVE_SUBMIT_BURST = int(os.getenv("ARCHIVE_SUBMIT_BURST", 10))
+ARCHIVE_SUBMIT_MAX_ATTEMPTS = int(os.getenv("ARCHIVE_SUBMIT_MAX_ATTEMPTS", 5))
+
+# Logging goes through a queue to a background thread; repeated warnings
+# within the window are collapsed into a single summary line.
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_COLLAPSE_WINDOW_SEC = int(os.getenv("LOG_COLLAPSE_WINDOW_SEC", 60))
+
+# Pacing of the main loop: UPDATE_DELAY_SEC is the interval when the queue is
+# quiet, it gets shorter down to POLL_MIN_INTERVAL_SEC when there's activity.
+# Errors back off exponentially from ERROR_BACKOFF_BASE_SEC.
+POLL_MIN_INTERVAL_SEC = int(os.getenv("POLL_MIN_INTERVAL_SEC", 10))
+ERROR_BACKOFF_BASE_SEC = int(os.getenv("ERROR_BACKOFF_BASE_SEC", 5))
+ERROR_BACKOFF_MAX_SEC = int(os.getenv("ERROR_BACKOFF_MAX_SEC", 10 * 60))
+
+# Metrics are written to this file as JSON after every cycle, if it's set
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+
+# Memory instrumentation: take a tracemalloc snapshot every N cycles (0 is off)
+# and log where the memory grew since the previous one.
+MEMORY_SNAPSHOT_EVERY = int(os.getenv("MEMORY_SNAPSHOT_EVERY", 0))
+MEMORY_GROWTH_LIMIT_BYTES = int(os.getenv("MEMORY_GROWTH_LIMIT_BYTES", 64 * 1024))
+
+# Client-side cache for the GET requests to Blossom. Unchanged list pages are
+# skipped, but processed again at least every HTTP_CACHE_MAX_SKIP_SEC.
+HTTP_CACHE_MAX_ENTRIES = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", 256))
+HTTP_CACHE_MAX_SKIP_SEC = int(os.getenv("HTTP_CACHE_MAX_SKIP_SEC", 30 * 60))
+
+# Changes to Blossom submissions are collected for a short window and sent
+# together, through a bulk endpoint if Blossom has one.
+MUTATION_BATCH_WINDOW_SEC = float(os.getenv("MUTATION_BATCH_WINDOW_SEC", 2))
+MUTATION_BATCH_SIZE = int(os.getenv("MUTATION_BATCH_SIZE", 100))
+
+# The number of requests in flight to Blossom and to Reddit adapts to how
+# they're doing, between these bounds. Requests slower than the latency
+# target count as a sign of overload.
+CONCURRENCY_MIN = float(os.getenv("CONCURRENCY_MIN", 0.25))
+CONCURRENCY_MAX = int(os.getenv("CONCURRENCY_MAX", 8))
+BLOSSOM_LATENCY_TARGET_SEC = float(os.getenv("BLOSSOM_LATENCY_TARGET_SEC", 2))
+REDDIT_LATENCY_TARGET_SEC = float(os.getenv("REDDIT_LATENCY_TARGET_SEC", 3))
+
+# A snapshot of what the bot knows is written every SNAPSHOT_INTERVAL_SEC and
+# loaded on startup, unless it's older than SNAPSHOT_MAX_AGE_SEC. Like the
+# archive queue, it's named after the INSTANCE_ID by default.
+SNAPSHOT_FILE = os.getenv("SNAPSHOT_FILE", f"state_snapshot{_INSTANCE_SUFFIX}.json")
+SNAPSHOT_INTERVAL_SEC = int(os.getenv("SNAPSHOT_INTERVAL_SEC", 60))
+SNAPSHOT_MAX_AGE_SEC = int(os.getenv("SNAPSHOT_MAX_AGE_SEC", 6 * 60 * 60))
+KNOWN_RECORDS_MAX = int(os.getenv("KNOWN_RECORDS_MAX", 5000))
+KNOWN_RECORDS_TTL_SEC = int(os.getenv("KNOWN_RECORDS_TTL_SEC", 30 * 60))
+# Partner subreddits found to be private are remembered for this long. That's
+# only used for logging; their posts are still checked one by one.
+PRIVATE_SUBREDDIT_TTL_SEC = int(os.getenv("PRIVATE_SUBREDDIT_TTL_SEC", 60 * 60))
+
+# Optional receiver for events pushed by Blossom, disabled unless a port is
+# set. While it's on, the sweep for completed posts only runs every
+# WEBHOOK_SWEEP_INTERVAL_SEC, to catch lost events.
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 0))
+WEBHOOK_TOKEN = os.getenv("WEBHOOK_TOKEN", "")
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", 1000))
+WEBHOOK_SWEEP_INTERVAL_SEC = int(os.getenv("WEBHOOK_SWEEP_INTERVAL_SEC", 60 * 60))
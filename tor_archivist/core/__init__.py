@@ -4,3 +4,7 @@ import os
 __version__ = "0.6.0"
 
 __HEARTBEAT_FILE__ = os.getenv("HEARTBEAT_FILE", "heartbeat.port")
+
+# The stages of a bot cycle, in the order they are run. Kept here rather than
+# next to the stage functions so the CLI can offer them without importing PRAW.
+STAGE_NAMES = ("completed", "expired", "sync", "removals", "reports")
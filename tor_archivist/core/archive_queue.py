@@ -0,0 +1,199 @@
+"""A persistent queue of posts waiting to be submitted to the archive subreddit.
+
+Completed posts are put in the queue instead of being submitted right away,
+so that a burst of completions doesn't run into Reddit's rate limit halfway
+through the archiving stage. The queue is drained at the pace of a token
+bucket refilled at the posting budget of the account; when Reddit asks us to
+wait anyway, the queue remembers until when and picks up where it left off.
+"""
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, Set, Tuple
+
+from praw.exceptions import RedditAPIException
+
+from tor_archivist.core.helpers import get_rate_limit_delay
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    submission_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    url TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_until REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+# How long to wait when Reddit rate limits us without saying for how long
+DEFAULT_RATE_LIMIT_DELAY = 10 * 60
+# A post being submitted is claimed for this long, so that other processes
+# draining the same queue (e.g. a run-once job next to the daemon) skip it.
+# If the process dies halfway, the post is picked up again afterwards.
+CLAIM_TTL_SEC = 5 * 60
+
+
+class ArchiveQueue:
+    """The queue of posts to submit to the archive subreddit.
+
+    Several processes can drain the same queue file: every post is claimed,
+    and its token taken from the budget, in a single transaction before it's
+    submitted.
+    """
+
+    def __init__(self, path: str, submits_per_hour: float, burst: int, max_attempts: int) -> None:
+        """Open the queue file, creating it if needed."""
+        self.refill_rate = submits_per_hour / 3600
+        self.burst = burst
+        self.max_attempts = max_attempts
+        # Autocommit mode, the transactions are managed by hand in `_transaction`
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.executescript(_SCHEMA)
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(posts)")}
+        if "claimed_until" not in columns:
+            # Queue files from before the claims
+            self.db.execute(
+                "ALTER TABLE posts ADD COLUMN claimed_until REAL NOT NULL DEFAULT 0"
+            )
+
+    def __len__(self) -> int:
+        (count,) = self.db.execute("SELECT COUNT(*) FROM posts").fetchone()
+        return count
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """Run the block in a transaction that holds the write lock from the start."""
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    def _get_state(self, key: str, default: float) -> float:
+        row = self.db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def _set_state(self, key: str, value: float) -> None:
+        self.db.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+
+    def _tokens(self, now: float) -> float:
+        """Return the tokens in the bucket, refilled up to now."""
+        refilled_at = self._get_state("refilled_at", now)
+        return min(
+            self.burst,
+            self._get_state("tokens", self.burst) + max(now - refilled_at, 0) * self.refill_rate,
+        )
+
+    def _add_tokens(self, now: float, count: float) -> None:
+        self._set_state("tokens", min(self.burst, self._tokens(now) + count))
+        self._set_state("refilled_at", now)
+
+    def put(self, submission_id: Any, title: str, url: str) -> None:
+        """Add a post to the end of the queue, unless it's queued already."""
+        self.db.execute(
+            "INSERT OR IGNORE INTO posts (submission_id, title, url, enqueued_at)"
+            " VALUES (?, ?, ?, ?)",
+            (str(submission_id), title, url, time.time()),
+        )
+
+    def _claim_next(self, now: float, tried: Set[str]) -> Optional[Tuple[str, str, str, int]]:
+        """Claim the next post and take a token for it, if the budget allows.
+
+        :param tried: The posts to pass over, as they were tried already.
+        :returns: The submission ID, title, URL and attempts of the claimed post.
+        """
+        with self._transaction():
+            if now < self._get_state("not_before", 0) or self._tokens(now) < 1:
+                return None
+            rows = self.db.execute(
+                "SELECT submission_id, title, url, attempts FROM posts"
+                " WHERE claimed_until <= ? ORDER BY enqueued_at LIMIT ?",
+                (now, len(tried) + 1),
+            ).fetchall()
+            post = next((row for row in rows if row[0] not in tried), None)
+            if post is None:
+                return None
+            self.db.execute(
+                "UPDATE posts SET claimed_until = ? WHERE submission_id = ?",
+                (now + CLAIM_TTL_SEC, post[0]),
+            )
+            self._add_tokens(now, -1)
+        return post
+
+    def _release(self, submission_id: str, now: float) -> None:
+        """Hand back the claim on a post that wasn't submitted, and its token."""
+        self.db.execute(
+            "UPDATE posts SET claimed_until = 0 WHERE submission_id = ?", (submission_id,)
+        )
+        self._add_tokens(now, 1)
+
+    def _record_failure(
+        self, submission_id: str, attempts: int, error: Exception, now: float
+    ) -> None:
+        """Count a failed attempt to post, giving up on the post after max_attempts."""
+        with self._transaction():
+            self._release(submission_id, now)
+            if attempts + 1 >= self.max_attempts:
+                logging.error("Giving up on archiving submission %s: %s", submission_id, error)
+                self.db.execute("DELETE FROM posts WHERE submission_id = ?", (submission_id,))
+            else:
+                logging.warning("Failed to archive submission %s: %s", submission_id, error)
+                self.db.execute(
+                    "UPDATE posts SET attempts = attempts + 1 WHERE submission_id = ?",
+                    (submission_id,),
+                )
+
+    def drain(self, submit: Callable[[str, str], Any], now: Optional[float] = None) -> int:
+        """Submit as many queued posts as the posting budget allows right now.
+
+        Never waits: posts that don't fit in the budget stay queued for the
+        next call.
+
+        :param submit: Called with the title and URL of each post to submit.
+        :returns: The number of posts submitted.
+        """
+        now = time.time() if now is None else now
+        submitted = 0
+        tried: Set[str] = set()
+        while True:
+            post = self._claim_next(now, tried)
+            if post is None:
+                break
+            submission_id, title, url, attempts = post
+            tried.add(submission_id)
+            try:
+                submit(title, url)
+            except RedditAPIException as e:
+                rate_limit = next((i for i in e.items if i.error_type == "RATELIMIT"), None)
+                if rate_limit is None:
+                    # Something wrong with this post, e.g. ALREADY_SUB; the
+                    # others can still go through
+                    self._record_failure(submission_id, attempts, e, now)
+                    continue
+                delay = get_rate_limit_delay(rate_limit.message) or DEFAULT_RATE_LIMIT_DELAY
+                with self._transaction():
+                    self._release(submission_id, now)
+                    self._set_state("not_before", now + delay)
+                logging.warning(
+                    "Rate limited while posting to the archive, %s posts will wait %ss.",
+                    len(self),
+                    delay,
+                )
+                break
+            except Exception as e:
+                self._record_failure(submission_id, attempts, e, now)
+                continue
+
+            submitted += 1
+            self.db.execute("DELETE FROM posts WHERE submission_id = ?", (submission_id,))
+            logging.info("Submission %s (%s) posted to the archive!", submission_id, url)
+
+        return submitted
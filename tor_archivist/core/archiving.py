@@ -0,0 +1,163 @@
+"""Archiving of completed and expired submissions."""
+import logging
+from typing import Any, Dict, List, Optional
+
+from prawcore import Forbidden
+
+from tor_archivist.core.blossom import (
+    archive_on_blossom,
+    in_own_shard,
+    nsfw_on_blossom,
+    remove_on_blossom,
+)
+from tor_archivist.core.config import Config
+from tor_archivist.core.helpers import get_id_from_url
+from tor_archivist.core.http_cache import should_skip
+from tor_archivist.core.records import BlossomSubmission, SubmissionPage
+from tor_archivist.core.reddit import (
+    note_public_subreddit,
+    nsfw_on_reddit,
+    remove_private_submission,
+)
+
+
+def get_submission_list(cfg: Config, path: str) -> Optional[List[BlossomSubmission]]:
+    """Get the submissions returned by one of the Blossom list endpoints.
+
+    :returns: The submissions or None if Blossom returned an error. If the
+        list hasn't changed since it was last processed, it's empty.
+    """
+    response = cfg.blossom.get(path)
+    if not response.ok:
+        logging.warning("Received bad response from Blossom. Cannot process.")
+        return None
+    if should_skip(response):
+        logging.info("Nothing changed on %s since the last run, skipping.", path)
+        return []
+    return SubmissionPage.from_response(response).results
+
+
+def update_removed_expired_submission(
+    cfg: Config, b_submission: BlossomSubmission, r_submission: Any
+) -> None:
+    """Update an expired submission that has been removed from ToR already.
+
+    The post was not archived, but has been removed from ToR already. We need
+    to update the Blossom object to remove this post from the endpoint.
+    """
+    logging.info(
+        "Updating outdated archive status for submission %s (%s)",
+        b_submission.id,
+        b_submission.tor_url,
+    )
+    try:
+        partner_submission = cfg.reddit.submission(url=r_submission.url)
+
+        # Update NSFW status just to be safe
+        partner_nsfw = partner_submission.over_18
+        note_public_subreddit(cfg, b_submission)
+        if not r_submission.over_18 and partner_nsfw:
+            nsfw_on_reddit(r_submission)
+            nsfw_on_blossom(cfg, b_submission)
+
+        if partner_submission.removed_by_category:
+            # The submission has been removed on the partner sub, remove it on Blossom
+            remove_on_blossom(cfg, b_submission)
+        else:
+            # Archive it on Blossom
+            archive_on_blossom(cfg, b_submission)
+    except Forbidden:
+        # The sub is private, remove the submission from the queue
+        remove_private_submission(cfg, r_submission, b_submission)
+
+
+def archive_expired_submission(cfg: Config, b_submission: BlossomSubmission) -> None:
+    """Archive a single post that is too old."""
+    # Only archived if it hasn't been removed already
+    r_submission = cfg.reddit.submission(url=b_submission.tor_url)
+
+    if not r_submission.removed_by_category:
+        r_submission.mod.remove()
+        archive_on_blossom(cfg, b_submission)
+    else:
+        update_removed_expired_submission(cfg, b_submission, r_submission)
+
+
+def process_expired_posts(cfg: Config) -> None:
+    """Process posts that are too old."""
+    b_submissions = get_submission_list(cfg, "submission/expired/")
+    if b_submissions is None:
+        return
+
+    for b_submission in b_submissions:
+        if not in_own_shard(cfg, b_submission):
+            continue
+        archive_expired_submission(cfg, b_submission)
+
+
+def get_human_transcription(cfg: Config, submission: BlossomSubmission) -> Dict:
+    """Get the transcription of the given submission that was made by a human."""
+    response = cfg.blossom.get("transcription/search/", params={"submission_id": submission.id})
+    for transcription in response.json():
+        if int(get_id_from_url(transcription["author"])) == cfg.transcribot["id"]:
+            continue
+        else:
+            return transcription
+
+
+def archive_completed_submission(cfg: Config, submission: BlossomSubmission) -> None:
+    """Archive a single post that has been completed by a volunteer.
+
+    The post for r/ToR_Archive is only queued; see `drain_archive_queue`.
+    """
+    reddit_post = cfg.reddit.submission(url=submission.tor_url)
+    reddit_post.mod.remove()
+    archive_on_blossom(cfg, submission)
+
+    transcription = get_human_transcription(cfg, submission)
+
+    if not transcription:
+        logging.warning(
+            "Received completed post ID %s with no valid transcriptions.", submission.id
+        )
+        # This means that we _should not_ make a post on r/ToR_Archive
+        # because there's no transcription to link to.
+        return
+
+    if not transcription.get("url"):
+        logging.warning("Transcription %s does not have a URL - skipping.", transcription["id"])
+        return
+
+    if "reddit.com" not in transcription["url"]:
+        transcription["url"] = f"https://reddit.com{transcription['url']}"
+
+    cfg.archive_queue.put(submission.id, reddit_post.title, transcription["url"])
+    logging.info("Submission %s (%s) queued for the archive!", submission.id, submission.tor_url)
+
+
+def archive_completed_posts(cfg: Config) -> None:
+    """Archive posts that have been completed by a volunteer."""
+    submissions = get_submission_list(cfg, "submission/unarchived/")
+    if submissions is None:
+        return
+
+    for submission in submissions:
+        if not in_own_shard(cfg, submission):
+            continue
+        archive_completed_submission(cfg, submission)
+
+    drain_archive_queue(cfg)
+
+
+def drain_archive_queue(cfg: Config) -> None:
+    """Post the queued archive posts that fit in the posting budget."""
+    if len(cfg.archive_queue) == 0:
+        return
+
+    submitted = cfg.archive_queue.drain(lambda title, url: cfg.archive.submit(title, url=url))
+    if len(cfg.archive_queue) > 0:
+        logging.info(
+            "Posted %s archive posts, %s are waiting their turn.",
+            submitted,
+            len(cfg.archive_queue),
+        )
@@ -1,92 +1,83 @@
-import logging
-from typing import Dict, Optional
+from typing import Optional
 
 from tor_archivist.core.config import Config
+from tor_archivist.core.records import BlossomSubmission, SubmissionPage
 
 
-def get_blossom_submission(cfg: Config, tor_url: str) -> Optional[Dict]:
+def get_blossom_submission(cfg: Config, tor_url: str) -> Optional[BlossomSubmission]:
     """Get the Blossom submission corresponding to the given ToR URL.
 
+    Recently seen submissions are served from the record cache.
+
     :returns: The Blossom submission object or None if it couldn't be found.
     """
+    cached = cfg.records.get(tor_url)
+    if cached is not None:
+        return cached
+
     submission_response = cfg.blossom.get("submission", params={"tor_url": tor_url})
     if not submission_response.ok:
         return None
 
-    submissions = submission_response.json()["results"]
+    submissions = SubmissionPage.from_response(submission_response).results
     if len(submissions) == 0:
         return None
 
     submission = submissions[0]
+    cfg.records.put(submission)
     return submission
 
 
-def report_handled_blossom(b_submission: Dict) -> bool:
+def get_blossom_submission_by_id(cfg: Config, b_id: int) -> Optional[BlossomSubmission]:
+    """Get the Blossom submission with the given ID.
+
+    :returns: The Blossom submission object or None if it couldn't be found.
+    """
+    submission_response = cfg.blossom.get(f"submission/{b_id}/")
+    if not submission_response.ok:
+        return None
+    return BlossomSubmission.from_json(submission_response.json())
+
+
+def in_own_shard(cfg: Config, b_submission: BlossomSubmission) -> bool:
+    """Determine if this instance is responsible for the given submission."""
+    return cfg.shards is None or cfg.shards.owns(b_submission.id)
+
+
+def report_handled_blossom(b_submission: BlossomSubmission) -> bool:
     """Determine if the report is already handled on Blossom."""
-    return (
-        b_submission.get("removed_from_queue")
+    return bool(
+        b_submission.removed_from_queue
         # These are not exposed to the API yet
         # But it doesn't hurt to leave them in and it'll work if we ever expose them
-        or b_submission.get("approved")
-        or b_submission.get("report_reason")
+        or b_submission.approved
+        or b_submission.report_reason
     )
 
 
-def remove_on_blossom(cfg: Config, b_submission: Dict) -> None:
-    """Remove the given submission from Blossom."""
-    b_id = b_submission["id"]
-    tor_url = b_submission["tor_url"]
+def remove_on_blossom(cfg: Config, b_submission: BlossomSubmission) -> None:
+    """Remove the given submission from Blossom.
 
-    removal_response = cfg.blossom.patch(f"submission/{b_id}/remove")
-    if removal_response.ok:
-        logging.info(f"Removed submission {b_id} ({tor_url}) from Blossom.")
-    else:
-        logging.warning(
-            f"Failed to remove submission {b_id} ({tor_url}) from Blossom! "
-            f"({removal_response.status_code})"
-        )
+    The change is sent with the next batch, see `MutationBatcher`.
+    """
+    cfg.mutations.submit("remove", b_submission)
 
 
-def approve_on_blossom(cfg: Config, b_submission: Dict) -> None:
+def approve_on_blossom(cfg: Config, b_submission: BlossomSubmission) -> None:
     """Approve the given submission on Blossom."""
-    b_id = b_submission["id"]
-    tor_url = b_submission["tor_url"]
+    cfg.mutations.submit("approve", b_submission)
 
-    approve_response = cfg.blossom.patch(f"submission/{b_id}/approve")
-    if approve_response.ok:
-        logging.info(f"Approved submission {b_id} ({tor_url}) on Blossom.")
-    else:
-        logging.warning(
-            f"Failed to approve submission {b_id} ({tor_url}) on Blossom! "
-            f"({approve_response.status_code})"
-        )
 
-
-def nsfw_on_blossom(cfg: Config, b_submission: Dict) -> None:
+def nsfw_on_blossom(cfg: Config, b_submission: BlossomSubmission) -> None:
     """Mark the submission as NSFW on Blossom."""
-    b_id = b_submission["id"]
-    tor_url = b_submission["tor_url"]
-
-    nsfw_response = cfg.blossom.patch(f"submission/{b_id}/nsfw")
-    if nsfw_response.ok:
-        logging.info(f"Submission {b_id} ({tor_url}) marked as NSFW on Blossom.")
-    else:
-        logging.warning(
-            f"Failed to mark submission {b_id} ({tor_url}) as NSFW on Blossom! "
-            f"({nsfw_response.status_code})"
-        )
+    cfg.mutations.submit("nsfw", b_submission)
 
 
-def report_on_blossom(cfg: Config, b_submission: Dict, reason: str) -> None:
+def report_on_blossom(cfg: Config, b_submission: BlossomSubmission, reason: str) -> None:
     """Report the submission on Blossom."""
-    b_id = b_submission["id"]
-    tor_url = b_submission["tor_url"]
-
-    report_response = cfg.blossom.patch(f"submission/{b_id}/report", data={"reason": reason})
-    if report_response.ok:
-        logging.info(f"Reported submission {b_id} ({tor_url}) to Blossom.")
-    else:
-        logging.warning(
-            f"Failed to report submission {b_id} ({tor_url}) to Blossom! "
-            f"({report_response.status_code})"
-        )
+    cfg.mutations.submit("report", b_submission, reason)
+
+
+def archive_on_blossom(cfg: Config, b_submission: BlossomSubmission) -> None:
+    """Archive the submission on Blossom."""
+    cfg.mutations.submit("archive", b_submission)
@@ -0,0 +1,200 @@
+"""Bulk processing of expired submissions for Clear the Queue mode.
+
+The regular expired stage handles one submission at a time, with a Reddit
+request to load every post. Here the expired submissions are pulled in large
+pages, the Reddit posts are loaded 100 at a time and the Blossom updates are
+sent from a pool of threads while the main thread works on Reddit. PRAW isn't
+thread safe, so everything touching Reddit stays on the main thread.
+"""
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Set
+
+from praw.models import Submission
+
+from tor_archivist import (
+    CONCURRENCY_MAX,
+    CTQ_PAGE_SIZE,
+    CTQ_PROGRESS_INTERVAL_SEC,
+    CTQ_RATELIMIT_RESERVE,
+)
+from tor_archivist.core.archiving import update_removed_expired_submission
+from tor_archivist.core.blossom import in_own_shard
+from tor_archivist.core.config import Config
+from tor_archivist.core.helpers import wait_out
+from tor_archivist.core.mutations import response_outcome
+from tor_archivist.core.records import BlossomSubmission, SubmissionPage
+
+# The maximum amount of fullnames Reddit accepts in a single info request
+HYDRATE_BATCH_SIZE = 100
+
+
+class Progress:
+    """Periodically log how far along the queue clearing is."""
+
+    def __init__(self, interval: float = CTQ_PROGRESS_INTERVAL_SEC) -> None:
+        """Start the clock."""
+        self.interval = interval
+        self.total: Optional[int] = None
+        self.done = 0
+        self.started_at = time.monotonic()
+        self.logged_at = self.started_at
+
+    def eta(self) -> Optional[float]:
+        """Return the estimated seconds until we're done, if it's known."""
+        elapsed = time.monotonic() - self.started_at
+        if not self.total or not self.done or elapsed <= 0:
+            return None
+        return max(self.total - self.done, 0) / (self.done / elapsed)
+
+    def tick(self, count: int = 1, force: bool = False) -> None:
+        """Record processed submissions, logging the progress when it's time to."""
+        self.done += count
+        now = time.monotonic()
+        if not force and now - self.logged_at < self.interval:
+            return
+        self.logged_at = now
+
+        rate = self.done / max(now - self.started_at, 1e-6)
+        eta = self.eta()
+        logging.info(
+            "Clear the Queue: %s/%s submissions processed (%.1f/s, ETA %s)",
+            self.done,
+            self.total or "?",
+            rate,
+            "?" if eta is None else f"{eta / 60:.1f} min",
+        )
+
+
+def _iter_expired_batches(cfg: Config, progress: Progress) -> Iterator[List[BlossomSubmission]]:
+    """Yield the expired submissions that haven't been seen yet, a page at a time.
+
+    Processed submissions disappear from the endpoint, so we stay on the same
+    page as long as it keeps giving us new submissions and only move on when
+    it's full of ones we've seen (e.g. that belong to another shard).
+    """
+    seen: Set[int] = set()
+    page = 1
+    while True:
+        response = cfg.blossom.get(
+            "submission/expired/",
+            params={"ctq": True, "page_size": CTQ_PAGE_SIZE, "page": page},
+        )
+        if not response.ok:
+            logging.error("Failed to get expired submissions from Blossom:\n%s", response)
+            return
+
+        expired_page = SubmissionPage.from_response(response)
+        if progress.total is None:
+            progress.total = expired_page.count
+
+        new = [b_submission for b_submission in expired_page.results if b_submission.id not in seen]
+        seen.update(b_submission.id for b_submission in new)
+        if new:
+            yield new
+        elif expired_page.next is not None:
+            page += 1
+        else:
+            return
+
+
+def _hydrate(
+    cfg: Config, b_submissions: List[BlossomSubmission]
+) -> Optional[Dict[str, Submission]]:
+    """Load the Reddit posts of the given submissions in as few requests as possible.
+
+    :returns: The posts by ID, or None if we were interrupted while waiting.
+    """
+    fullnames = [f"t3_{Submission.id_from_url(b.tor_url)}" for b in b_submissions]
+    r_submissions = {}
+    for start in range(0, len(fullnames), HYDRATE_BATCH_SIZE):
+        if _pace(cfg):
+            return None
+        batch = fullnames[start : start + HYDRATE_BATCH_SIZE]
+        for r_submission in cfg.reddit.info(fullnames=batch):
+            r_submissions[r_submission.id] = r_submission
+    return r_submissions
+
+
+def _pace(cfg: Config) -> bool:
+    """Wait for the Reddit rate limit window to reset if we're about to run out.
+
+    :returns: True if the bot is shutting down and we should stop.
+    """
+    limits = cfg.reddit.auth.limits
+    remaining = limits.get("remaining")
+    reset_timestamp = limits.get("reset_timestamp")
+    if remaining is None or reset_timestamp is None or remaining > CTQ_RATELIMIT_RESERVE:
+        return False
+
+    delay = reset_timestamp - time.time()
+    if delay <= 0:
+        return False
+    logging.info("Clear the Queue: Reddit rate limit almost used up, waiting %.0fs", delay)
+    return wait_out(cfg, delay)
+
+
+def _archive_on_blossom(cfg: Config, b_submission: BlossomSubmission) -> None:
+    """Archive the submission on Blossom; run from the thread pool."""
+    ok, status = response_outcome(cfg.blossom.archive_submission(submission_id=b_submission.id))
+    if not ok:
+        logging.error(
+            "Failed to archive submission %s (%s) on Blossom! (%s)",
+            b_submission.id,
+            b_submission.tor_url,
+            status,
+        )
+        return
+    logging.debug("Archived expired submission %s (%s)", b_submission.id, b_submission.tor_url)
+
+
+def _log_failure(future: Future) -> None:
+    """Log the error of a failed Blossom update."""
+    if future.exception() is not None:
+        logging.error("Failed to archive submission on Blossom: %s", future.exception())
+
+
+def clear_the_queue(cfg: Config) -> None:
+    """Archive all expired posts as fast as the rate limits allow."""
+    logging.info("Clear the Queue: starting bulk processing of expired posts...")
+    progress = Progress()
+    interrupted = False
+
+    # The Blossom limiter decides how many of the workers can be busy at once
+    with ThreadPoolExecutor(max_workers=CONCURRENCY_MAX) as pool:
+        for batch in _iter_expired_batches(cfg, progress):
+            own_batch = [b_submission for b_submission in batch if in_own_shard(cfg, b_submission)]
+            r_submissions = _hydrate(cfg, own_batch)
+            if r_submissions is None:
+                interrupted = True
+                break
+            pending = []
+
+            for b_submission in own_batch:
+                r_submission = r_submissions.get(Submission.id_from_url(b_submission.tor_url))
+                if r_submission is None:
+                    logging.warning("Can't find %s on Reddit, skipping.", b_submission.tor_url)
+                elif _pace(cfg):
+                    interrupted = True
+                    break
+                elif not r_submission.removed_by_category:
+                    r_submission.mod.remove()
+                    future = pool.submit(_archive_on_blossom, cfg, b_submission)
+                    future.add_done_callback(_log_failure)
+                    pending.append(future)
+                else:
+                    update_removed_expired_submission(cfg, b_submission, r_submission)
+                progress.tick()
+
+            # Let the batch settle before fetching the next page; updates still
+            # in flight would shift the pages around under us otherwise.
+            wait(pending)
+            if interrupted:
+                break
+
+    progress.tick(0, force=True)
+    if interrupted:
+        logging.info("Clear the Queue: interrupted, stopping early.")
+    else:
+        logging.info("Clear the Queue: finished processing expired posts.")
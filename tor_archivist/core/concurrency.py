@@ -0,0 +1,151 @@
+"""Adaptive limits on the number of requests in flight, per backend.
+
+Every request to Blossom and Reddit goes through the limiter of its backend.
+The limit grows by one request per limit's worth of fast, successful
+requests, and is halved (at most once per round trip) when a request is
+slow, fails, is answered with a 429 or 5xx, or Reddit tells us to slow
+down. That's AIMD, the same scheme TCP uses for its congestion window.
+
+Below one, the limit spaces requests out instead: at 0.5 the backend sits
+idle for a round trip after every request, at 0.25 for three.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Optional, TypeVar
+
+from tor_archivist.core import metrics
+
+T = TypeVar("T")
+
+# How much weight past requests keep in the latency average
+LATENCY_DECAY = 0.8
+
+
+def classify_response(response: Any) -> Optional[str]:
+    """Return why the response signals an overloaded backend, if it does."""
+    status = getattr(response, "status_code", None)
+    if status == 429:
+        return "429"
+    if status is not None and status >= 500:
+        return "5xx"
+    return None
+
+
+class AdaptiveLimiter:
+    """Limits the number of concurrent requests to one backend.
+
+    :param name: The name of the backend, used in the logs and metrics.
+    :param initial: The limit to start out with.
+    :param latency_target: Requests slower than this count as overload.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: float,
+        min_limit: float,
+        max_limit: float,
+        latency_target: float,
+        decrease_factor: float = 0.5,
+    ) -> None:
+        """Create a limiter with no requests in flight."""
+        self.name = name
+        self.key = name.lower()
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+
+        self.in_flight = 0
+        # Moving average of the request latency
+        self.latency = latency_target / 2
+        self.last_start = 0.0
+        self.last_decrease = 0.0
+        self._reported_limit = int(self.limit)
+        self._condition = threading.Condition()
+        metrics.set_gauge(f"concurrency_limit_{self.key}", self.limit)
+
+    def _pause(self) -> float:
+        """Return how long to leave the backend idle between requests."""
+        if self.limit >= 1:
+            return 0.0
+        return (1 / self.limit - 1) * self.latency
+
+    def acquire(self) -> None:
+        """Wait until another request may be sent."""
+        with self._condition:
+            while True:
+                if self.in_flight < max(1, int(self.limit)):
+                    remaining = self.last_start + self._pause() - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                else:
+                    self._condition.wait()
+            self.in_flight += 1
+            self.last_start = time.monotonic()
+
+    def release(self, latency: float, overload: Optional[str] = None) -> None:
+        """Record the outcome of a request and free its slot.
+
+        :param latency: How long the request took.
+        :param overload: Why the request signals overload, if it does.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            self.latency = LATENCY_DECAY * self.latency + (1 - LATENCY_DECAY) * latency
+            if overload is None and latency > self.latency_target:
+                overload = "latency"
+            if overload is None:
+                self._increase()
+            else:
+                self._decrease(overload)
+            self._condition.notify_all()
+
+    def record_overload(self, reason: str) -> None:
+        """Lower the limit because of a signal outside of the requests themselves."""
+        with self._condition:
+            self._decrease(reason)
+            self._condition.notify_all()
+
+    def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Call the function once a slot is free, recording how the request went."""
+        self.acquire()
+        start = time.monotonic()
+        overload = "error"
+        try:
+            result = func(*args, **kwargs)
+            overload = classify_response(result)
+            return result
+        finally:
+            self.release(time.monotonic() - start, overload)
+
+    def _increase(self) -> None:
+        # One more request per full window of successes; below one request
+        # the spacing is taken back more carefully
+        step = 1 / self.limit if self.limit >= 1 else 0.1
+        self.limit = min(self.max_limit, self.limit + step)
+        metrics.set_gauge(f"concurrency_limit_{self.key}", self.limit)
+        if int(self.limit) > self._reported_limit:
+            self._reported_limit = int(self.limit)
+            logging.info(
+                "%s concurrency limit raised to %d requests.", self.name, self._reported_limit
+            )
+
+    def _decrease(self, reason: str) -> None:
+        metrics.inc(f"concurrency_decreases_{self.key}_{reason}")
+        # A burst of failing requests was usually sent under the same limit,
+        # so only back off once per round trip.
+        now = time.monotonic()
+        if now - self.last_decrease < self.latency:
+            return
+        self.last_decrease = now
+
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        self._reported_limit = int(self.limit)
+        metrics.set_gauge(f"concurrency_limit_{self.key}", self.limit)
+        logging.warning(
+            "%s concurrency limit lowered to %.2f requests (%s).", self.name, self.limit, reason
+        )
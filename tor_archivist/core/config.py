@@ -1,19 +1,24 @@
 import os
-from typing import Any, Callable, Optional
-
-from blossom_wrapper import BlossomAPI
-from praw import Reddit
-from praw.models import Subreddit
-
-from tor_archivist import ARCHIVING_RUN_STEPS, __version__
-
-# Load configuration regardless of if bugsnag is setup correctly
-try:
-    import bugsnag
-except ImportError:
-    # If loading from setup.py or bugsnag isn't installed, we
-    # don't want to bomb out completely
-    bugsnag = None
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+
+from tor_archivist import ARCHIVING_RUN_STEPS, KNOWN_RECORDS_MAX, KNOWN_RECORDS_TTL_SEC
+from tor_archivist.core.records import RecordCache
+from tor_archivist.core.sync_priority import SyncStats
+
+if TYPE_CHECKING:
+    # Only needed for the annotations; importing them for real is slow and
+    # the config is loaded by every command, even the ones not touching Reddit.
+    from blossom_wrapper import BlossomAPI
+    from praw import Reddit
+    from praw.models import Subreddit
+
+    from tor_archivist.core.archive_queue import ArchiveQueue
+    from tor_archivist.core.concurrency import AdaptiveLimiter
+    from tor_archivist.core.memory import MemoryMonitor
+    from tor_archivist.core.mutations import MutationBatcher
+    from tor_archivist.core.pacing import PacingController
+    from tor_archivist.core.sharding import ShardLeases
+    from tor_archivist.core.webhook import WebhookReceiver
 
 _missing = object()
 
@@ -77,17 +82,52 @@ class Config(object):
     bot_version: str = "0.0.0"  # this should get overwritten by the bot process
 
     # to be overwritten later with blossom-wrapper
-    blossom: Optional[BlossomAPI] = None
+    blossom: Optional["BlossomAPI"] = None
     # to be overwritten with the Reddit connection
-    reddit: Optional[Reddit] = None
+    reddit: Optional["Reddit"] = None
     # the subreddit of the archives. Default is r/ToR_Archive
-    archive: Optional[Subreddit] = None
+    archive: Optional["Subreddit"] = None
     # the main subreddit. Default is r/TranscribersOfReddit
-    tor: Optional[Subreddit] = None
+    tor: Optional["Subreddit"] = None
+    # the posts waiting to be submitted to the archive subreddit
+    archive_queue: Optional["ArchiveQueue"] = None
+    # the adaptive limits on the requests in flight, by backend
+    limiters: Optional[Dict[str, "AdaptiveLimiter"]] = None
+    # the pending changes to Blossom submissions, sent in batches
+    mutations: Optional["MutationBatcher"] = None
+
+    # the Blossom volunteer objects of the bot itself and of u/transcribot
+    me: Optional[Dict] = None
+    transcribot: Optional[Dict] = None
+
+    # decides how long the main loop waits between cycles and after errors
+    pacing: Optional["PacingController"] = None
+
+    # the memory instrumentation, if enabled
+    memory: Optional["MemoryMonitor"] = None
+
+    # the shards leased by this instance, if running more than one
+    shards: Optional["ShardLeases"] = None
+
+    # the receiver for events pushed by Blossom, if enabled
+    webhook: Optional["WebhookReceiver"] = None
 
     # the current step number for the archiving runs
     # we can skip some steps if we want faster report syncing
     archive_run_step = ARCHIVING_RUN_STEPS
+    # the wall-clock time the next cycle is due
+    sleep_until: float = 0
+
+    def __init__(self) -> None:
+        """Set up the state that is kept in the snapshot between restarts."""
+        # when each stage last ran, by stage name
+        self.last_sync: Dict[str, float] = {}
+        # the Blossom submissions seen recently, by ToR URL
+        self.records = RecordCache(KNOWN_RECORDS_MAX, KNOWN_RECORDS_TTL_SEC)
+        # the partner subreddits found to be private, with the time we found out
+        self.private_subreddits: Dict[str, float] = {}
+        # what the full queue sync learned, to check the riskiest posts first
+        self.sync_stats = SyncStats(KNOWN_RECORDS_MAX)
 
 
 try:
@@ -95,11 +135,5 @@ try:
 except OSError:
     Config.bugsnag_api_key = os.environ.get("BUGSNAG_API_KEY", None)
 
-if bugsnag and Config.bugsnag_api_key:
-    bugsnag.configure(
-        api_key=Config.bugsnag_api_key,
-        app_version=__version__,
-    )
-
 # ----- Compatibility -----
 config = Config()
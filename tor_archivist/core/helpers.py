@@ -3,24 +3,16 @@ import re
 import signal
 import sys
 import time
-from typing import Any, Callable
+from typing import Any, Callable, Optional
 from urllib.parse import urlparse
 
-import praw
-import prawcore
-
 from tor_archivist.core import __version__
-from tor_archivist.core.config import config
+from tor_archivist.core.config import Config, config
 from tor_archivist.core.strings import bot_footer
 
-default_exceptions = (
-    prawcore.exceptions.RequestException,
-    prawcore.exceptions.ServerError,
-    prawcore.exceptions.Forbidden,
-)
-
 # error message for an API timeout
-_pattern = re.compile(r"again in (?P<number>[0-9]+) (?P<unit>\w+)s?\.$", re.IGNORECASE)
+# e.g. "try again in 5 minutes." or "Take a break for 9 minutes before trying again."
+_pattern = re.compile(r"(?P<number>[0-9]+) (?P<unit>second|minute|hour)s?\b", re.IGNORECASE)
 
 # CTRL+C handler variable
 running = True
@@ -62,18 +54,49 @@ def explode_gracefully(error: RuntimeError) -> None:
     sys.exit(1)
 
 
-def handle_rate_limit(exc: Any) -> None:
-    """Handle the Reddit rate limit."""
+def get_rate_limit_delay(message: str) -> Optional[int]:
+    """Return the seconds Reddit asks us to wait in the given rate limit message."""
     time_map = {
         "second": 1,
         "minute": 60,
         "hour": 60 * 60,
     }
-    matches = re.search(_pattern, exc.message)
+    matches = re.search(_pattern, message)
+
+    if matches is None:
+        return None
+    return int(matches["number"]) * time_map[matches["unit"].lower()]
+
 
-    if matches is not None:
-        delay = int(matches[0]) * time_map[matches[1]]
-        time.sleep(delay + 1)
+def wait_out(cfg: Config, delay: float) -> bool:
+    """Wait for the whole given time, unless the bot is shutting down.
+
+    For waits we were told to do, e.g. by a rate limit. New work wakes the
+    pacing controller too, but mustn't cut these short; the wake-up is passed
+    on to the main loop once the time is over.
+
+    :returns: True if the wait was cut short because the bot is shutting down.
+    """
+    deadline = time.monotonic() + delay
+    woken = False
+    while running:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            if woken:
+                cfg.pacing.wake()
+            return False
+        woken = cfg.pacing.wait(remaining) or woken
+    return True
+
+
+def handle_rate_limit(exc: Any) -> None:
+    """Handle the Reddit rate limit."""
+    if config.limiters:
+        config.limiters["reddit"].record_overload("RATELIMIT")
+    delay = get_rate_limit_delay(exc.message)
+
+    if delay is not None:
+        wait_out(config, delay + 1)
 
 
 def signal_handler(signal: Any, frame: Any) -> None:
@@ -96,9 +119,27 @@ def signal_handler(signal: Any, frame: Any) -> None:
 
     logging.info("\rUser triggered command line shutdown. Will terminate after current loop.")
     running = False
+    if config.pacing:
+        # Don't wait out the current sleep before shutting down
+        config.pacing.wake()
+
+
+def get_default_exceptions() -> tuple:
+    """Return the PRAW connection errors that the main loop survives.
+
+    PRAW is imported here instead of at the top of the module, so that
+    importing the helpers doesn't pull in the whole Reddit stack.
+    """
+    import prawcore
+
+    return (
+        prawcore.exceptions.RequestException,
+        prawcore.exceptions.ServerError,
+        prawcore.exceptions.Forbidden,
+    )
 
 
-def run_until_dead(func: Callable, exceptions: tuple = default_exceptions) -> None:
+def run_until_dead(func: Callable, exceptions: Optional[tuple] = None) -> None:
     """Run the function until it gets killed by the user.
 
     The official method that replaces all that ugly boilerplate required to
@@ -114,6 +155,11 @@ def run_until_dead(func: Callable, exceptions: tuple = default_exceptions) -> No
         issues) but they can be overridden with a passed-in set.
     :return: None.
     """
+    import praw
+
+    if exceptions is None:
+        exceptions = get_default_exceptions()
+
     # handler for CTRL+C
     signal.signal(signal.SIGINT, signal_handler)
 
@@ -121,6 +167,7 @@ def run_until_dead(func: Callable, exceptions: tuple = default_exceptions) -> No
         while running:
             try:
                 func(config)
+                config.pacing.record_success()
             except praw.exceptions.APIException as e:
                 if e.error_type == "RATELIMIT":
                     logging.warning(
@@ -129,8 +176,11 @@ def run_until_dead(func: Callable, exceptions: tuple = default_exceptions) -> No
                     )
                     handle_rate_limit(e)
             except exceptions as e:
-                logging.warning(f"{e} - Issue communicating with Reddit. Sleeping for 60s!")
-                time.sleep(60)
+                delay = config.pacing.error_delay()
+                logging.warning(
+                    "%s - Issue communicating with Reddit. Sleeping for %.0fs!", e, delay
+                )
+                config.pacing.wait(delay)
 
         logging.info("User triggered shutdown. Shutting down.")
         sys.exit(0)
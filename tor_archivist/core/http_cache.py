@@ -0,0 +1,141 @@
+"""Conditional-request caching for the GET requests to Blossom.
+
+The list endpoints mostly return the same thing cycle after cycle. The
+caching adapter remembers the ETag and Last-Modified validators of every
+response and sends them along the next time, so Blossom can answer with a
+bodyless 304. When Blossom doesn't send validators, a hash of the body is
+compared instead. Either way the response is marked as unchanged, so
+stages that only act on Blossom's data can skip processing it again.
+"""
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from requests import PreparedRequest, Response, Session
+from requests.adapters import HTTPAdapter
+
+from tor_archivist import HTTP_CACHE_MAX_SKIP_SEC
+from tor_archivist.core.concurrency import AdaptiveLimiter
+
+
+class CacheEntry:
+    """What we remember about the last response for a URL."""
+
+    __slots__ = ("etag", "last_modified", "digest", "content", "processed_at")
+
+    def __init__(
+        self,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        digest: str,
+        content: Optional[bytes],
+    ) -> None:
+        """Create a new cache entry."""
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        # Only needed (and kept) to answer a 304, i.e. if there are validators
+        self.content = content
+        # When the content of this entry was last processed by the bot
+        self.processed_at = time.time()
+
+
+class CachingAdapter(HTTPAdapter):
+    """A transport adapter that makes GET requests conditional.
+
+    If given a limiter, every request waits for a free slot in it.
+    """
+
+    def __init__(
+        self, max_entries: int, limiter: Optional[AdaptiveLimiter] = None, **kwargs: Any
+    ) -> None:
+        """Create the adapter, keeping at most the given number of URLs."""
+        super().__init__(**kwargs)
+        self.max_entries = max_entries
+        self.limiter = limiter
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    def _send(self, request: PreparedRequest, **kwargs: Any) -> Response:
+        if self.limiter is None:
+            return super().send(request, **kwargs)
+        return self.limiter.run(super().send, request, **kwargs)
+
+    def send(self, request: PreparedRequest, **kwargs: Any) -> Response:
+        """Send the request, revalidating the cached response if there is one."""
+        if request.method != "GET":
+            return self._send(request, **kwargs)
+
+        entry = self.entries.get(request.url)
+        if entry is not None and entry.content is not None:
+            if entry.etag:
+                request.headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                request.headers["If-Modified-Since"] = entry.last_modified
+
+        response = self._send(request, **kwargs)
+        response.unchanged = False
+        response.cache_entry = None
+
+        if response.status_code == 304 and entry is not None and entry.content is not None:
+            # Serve the cached body as if it was sent again
+            response.status_code = 200
+            response._content = entry.content
+            response.unchanged = True
+        elif response.status_code == 200:
+            digest = hashlib.sha256(response.content).hexdigest()
+            if entry is not None and entry.digest == digest:
+                response.unchanged = True
+            else:
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+                entry = CacheEntry(
+                    etag,
+                    last_modified,
+                    digest,
+                    response.content if etag or last_modified else None,
+                )
+        else:
+            return response
+
+        self.entries[request.url] = entry
+        self.entries.move_to_end(request.url)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        response.cache_entry = entry
+        return response
+
+
+def install_http_cache(
+    blossom: Any, max_entries: int, limiter: Optional[AdaptiveLimiter] = None
+) -> bool:
+    """Route the requests of the Blossom connection through a caching adapter.
+
+    :returns: Whether the cache could be installed.
+    """
+    session = getattr(blossom, "http", None)
+    if not isinstance(session, Session):
+        logging.warning("Blossom connection has no requests session, not caching requests.")
+        return False
+
+    adapter = CachingAdapter(max_entries, limiter)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return True
+
+
+def should_skip(response: Response) -> bool:
+    """Determine if the content of the response was processed recently enough to skip it.
+
+    Unchanged content is still processed every HTTP_CACHE_MAX_SKIP_SEC, so
+    that whatever failed the last time gets another try.
+    """
+    entry = getattr(response, "cache_entry", None)
+    if entry is None:
+        return False
+    now = time.time()
+    if getattr(response, "unchanged", False) and now - entry.processed_at < HTTP_CACHE_MAX_SKIP_SEC:
+        return True
+    entry.processed_at = now
+    return False
@@ -1,13 +1,56 @@
+import atexit
+import json
 import logging
 import os
+import time
+from typing import TYPE_CHECKING, Dict
 
-from blossom_wrapper import BlossomAPI
-from bugsnag.handlers import BugsnagHandler
-from praw import Reddit
-from praw.models import SubredditHelper
-
+from tor_archivist import (
+    ARCHIVE_QUEUE_FILE,
+    ARCHIVE_SUBMIT_BURST,
+    ARCHIVE_SUBMIT_MAX_ATTEMPTS,
+    ARCHIVE_SUBMITS_PER_HOUR,
+    BLOSSOM_LATENCY_TARGET_SEC,
+    CONCURRENCY_MAX,
+    CONCURRENCY_MIN,
+    ERROR_BACKOFF_BASE_SEC,
+    ERROR_BACKOFF_MAX_SEC,
+    HTTP_CACHE_MAX_ENTRIES,
+    INSTANCE_ID,
+    LOG_COLLAPSE_WINDOW_SEC,
+    LOG_QUEUE_SIZE,
+    MEMORY_SNAPSHOT_EVERY,
+    MUTATION_BATCH_SIZE,
+    MUTATION_BATCH_WINDOW_SEC,
+    POLL_MIN_INTERVAL_SEC,
+    REDDIT_LATENCY_TARGET_SEC,
+    SHARD_COUNT,
+    SHARD_LEASE_FILE,
+    SHARD_LEASE_TTL_SEC,
+    UPDATE_DELAY_SEC,
+    USER_INFO_CACHE_FILE,
+    USER_INFO_CACHE_TTL_SEC,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_QUEUE_SIZE,
+    WEBHOOK_TOKEN,
+    __version__,
+)
+from tor_archivist.core.archive_queue import ArchiveQueue
+from tor_archivist.core.concurrency import AdaptiveLimiter
 from tor_archivist.core.config import Config, config
 from tor_archivist.core.helpers import log_header
+from tor_archivist.core.http_cache import install_http_cache
+from tor_archivist.core.log_pipeline import start_log_pipeline
+from tor_archivist.core.memory import MemoryMonitor
+from tor_archivist.core.mutations import MutationBatcher
+from tor_archivist.core.pacing import PacingController
+from tor_archivist.core.sharding import ShardLeases
+from tor_archivist.core.webhook import WebhookReceiver
+
+if TYPE_CHECKING:
+    from blossom_wrapper import BlossomAPI
+    from praw.models import SubredditHelper
 
 
 def has_tor_environment_vars() -> bool:
@@ -19,7 +62,7 @@ def has_tor_environment_vars() -> bool:
     return True
 
 
-def configure_tor(config: Config) -> SubredditHelper:
+def configure_tor(config: Config) -> "SubredditHelper":
     """Assemble the tor object based on whether we've enabled debug mode.
 
     There's really no reason to put together a Subreddit
@@ -40,18 +83,35 @@ def configure_tor(config: Config) -> SubredditHelper:
 
 
 def configure_logging(config: Config) -> None:
-    """Configure the logging setup for the bot."""
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(levelname)s | %(funcName)s | %(message)s",
-        datefmt="%Y-%m-%dT%H:%M:%S",
+    """Configure the logging setup for the bot.
+
+    The actual writing happens on a background thread, so that the main loop
+    never waits on stderr or Bugsnag.
+    """
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(
+        logging.Formatter(
+            fmt="%(levelname)s | %(funcName)s | %(message)s",
+            datefmt="%Y-%m-%dT%H:%M:%S",
+        )
     )
+    handlers = [stream_handler]
 
     # will intercept anything error level or above
     if config.bugsnag_api_key:
+        import bugsnag
+        from bugsnag.handlers import BugsnagHandler
+
+        bugsnag.configure(api_key=config.bugsnag_api_key, app_version=__version__)
         bs_handler = BugsnagHandler()
         bs_handler.setLevel(logging.ERROR)
-        logging.getLogger("").addHandler(bs_handler)
+        handlers.append(bs_handler)
+
+    logging.getLogger().setLevel(logging.INFO)
+    listener = start_log_pipeline(handlers, LOG_QUEUE_SIZE, LOG_COLLAPSE_WINDOW_SEC)
+    atexit.register(listener.stop)
+
+    if config.bugsnag_api_key:
         logging.info("Bugsnag enabled!")
     else:
         logging.info("Not running with Bugsnag!")
@@ -59,8 +119,10 @@ def configure_logging(config: Config) -> None:
     log_header("Starting!")
 
 
-def get_blossom_connection() -> BlossomAPI:
+def get_blossom_connection() -> "BlossomAPI":
     """Return the BlossomAPI object."""
+    from blossom_wrapper import BlossomAPI
+
     return BlossomAPI(
         email=os.getenv("BLOSSOM_EMAIL"),
         password=os.getenv("BLOSSOM_PASSWORD"),
@@ -68,12 +130,44 @@ def get_blossom_connection() -> BlossomAPI:
     )
 
 
-def get_user_info(config: Config, username: str = "tor_archivist") -> None:
-    """Return info about the given user."""
-    return config.blossom.get("volunteer/", params={"username": username}).json()["results"][0]
+def _load_user_info_cache() -> Dict:
+    """Load the on-disk cache of Blossom user info, if there is any."""
+    try:
+        with open(USER_INFO_CACHE_FILE) as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_user_info_cache(cache: Dict) -> None:
+    """Write the cache of Blossom user info to disk."""
+    tmp_path = f"{USER_INFO_CACHE_FILE}.tmp"
+    try:
+        with open(tmp_path, "w") as cache_file:
+            json.dump(cache, cache_file)
+        os.replace(tmp_path, USER_INFO_CACHE_FILE)
+    except OSError as e:
+        logging.warning("Could not write user info cache %s: %s", USER_INFO_CACHE_FILE, e)
+
+
+def get_user_info(config: Config, username: str = "tor_archivist") -> Dict:
+    """Return info about the given user.
+
+    The result is cached on disk for USER_INFO_CACHE_TTL_SEC seconds, so that
+    restarting the bot doesn't have to wait on Blossom for it.
+    """
+    cache = _load_user_info_cache()
+    entry = cache.get(username)
+    if entry and time.time() - entry["fetched_at"] < USER_INFO_CACHE_TTL_SEC:
+        return entry["data"]
+
+    data = config.blossom.get("volunteer/", params={"username": username}).json()["results"][0]
+    cache[username] = {"fetched_at": time.time(), "data": data}
+    _save_user_info_cache(cache)
+    return data
 
 
-def build_bot(name: str, version: str) -> None:
+def build_bot(name: str, version: str, lease_shards: bool = True) -> None:
     """Shortcut for setting up a bot instance.
 
     Runs all configuration and returns a valid config object.
@@ -81,6 +175,9 @@ def build_bot(name: str, version: str) -> None:
     :param name: string; The name of the bot to be started; this name must
         match the settings in praw.ini
     :param version: string; the version number for the current bot being run
+    :param lease_shards: bool; whether to take a share of the shards. One-off
+        runs don't, so they don't take shards away from the daemons and work
+        on all submissions instead.
     :param full_name: string; the descriptive name of the current bot being
         run; this is used for the heartbeat and status
     :param log_name: string; the name to be used for the log file on disk. No
@@ -90,10 +187,27 @@ def build_bot(name: str, version: str) -> None:
         not have it crash on start because Redis isn't running.
     :return: None
     """
+    from praw import Reddit
+
+    from tor_archivist.core.reddit import LimitedRequestor
+
+    config.limiters = {
+        "blossom": AdaptiveLimiter(
+            "Blossom", 2, CONCURRENCY_MIN, CONCURRENCY_MAX, BLOSSOM_LATENCY_TARGET_SEC
+        ),
+        "reddit": AdaptiveLimiter(
+            "Reddit", 2, CONCURRENCY_MIN, CONCURRENCY_MAX, REDDIT_LATENCY_TARGET_SEC
+        ),
+    }
+    requestor = {
+        "requestor_class": LimitedRequestor,
+        "requestor_kwargs": {"limiter": config.limiters["reddit"]},
+    }
+
     if has_tor_environment_vars():
-        config.reddit = Reddit()
+        config.reddit = Reddit(**requestor)
     else:
-        config.reddit = Reddit(name)
+        config.reddit = Reddit(name, **requestor)
 
     # PRAW 7 has a weird behavior with the flag `validate_on_submit`. If we
     # submit something without touching this flag at all (e.g. the old way)
@@ -114,8 +228,56 @@ def build_bot(name: str, version: str) -> None:
     config.bot_version = version
     configure_logging(config)
 
+    config.pacing = PacingController(
+        min_interval=POLL_MIN_INTERVAL_SEC,
+        max_interval=UPDATE_DELAY_SEC,
+        backoff_base=ERROR_BACKOFF_BASE_SEC,
+        backoff_max=ERROR_BACKOFF_MAX_SEC,
+    )
+
     config.blossom = get_blossom_connection()
+    install_http_cache(config.blossom, HTTP_CACHE_MAX_ENTRIES, config.limiters["blossom"])
+    config.mutations = MutationBatcher(
+        config.blossom, MUTATION_BATCH_WINDOW_SEC, MUTATION_BATCH_SIZE, CONCURRENCY_MAX
+    )
+    atexit.register(config.mutations.flush)
+    config.archive_queue = ArchiveQueue(
+        ARCHIVE_QUEUE_FILE,
+        ARCHIVE_SUBMITS_PER_HOUR,
+        ARCHIVE_SUBMIT_BURST,
+        ARCHIVE_SUBMIT_MAX_ATTEMPTS,
+    )
     config.me = get_user_info(config)
     config.transcribot = get_user_info(config, "transcribot")
 
+    if MEMORY_SNAPSHOT_EVERY > 0:
+        config.memory = MemoryMonitor(MEMORY_SNAPSHOT_EVERY)
+        logging.info("Memory instrumentation enabled!")
+
+    if SHARD_COUNT > 1 and lease_shards:
+        config.shards = ShardLeases(
+            SHARD_LEASE_FILE, SHARD_COUNT, SHARD_LEASE_TTL_SEC, INSTANCE_ID or None
+        )
+        config.shards.renew()
+        atexit.register(config.shards.release)
+
     logging.info("Bot built and initialized!")
+
+
+def start_webhook(config: Config) -> None:
+    """Start the receiver for events pushed by Blossom, if it's enabled.
+
+    Only for the daemon; the one-off commands would fight it over the port.
+    """
+    if not WEBHOOK_PORT:
+        return
+
+    config.webhook = WebhookReceiver(
+        WEBHOOK_HOST,
+        WEBHOOK_PORT,
+        WEBHOOK_TOKEN or None,
+        WEBHOOK_QUEUE_SIZE,
+        config.pacing.wake,
+    )
+    config.webhook.start()
+    atexit.register(config.webhook.stop)
@@ -0,0 +1,147 @@
+"""Non-blocking logging.
+
+The loggers only put the records in a queue; a background thread formats
+them and writes them out to stderr and Bugsnag. Warnings that keep repeating
+(e.g. the same "Can't find submission ... in Blossom!" for a whole page of
+submissions) are logged once and then summarized with a count. Errors are
+always logged in full, with their tracebacks.
+"""
+import logging
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Tuple
+
+# Only collapse warnings: the INFO records are the progress of the bot, and
+# every error (and its traceback) is wanted in full.
+COLLAPSE_LEVEL = logging.WARNING
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Put the records in the queue without formatting them or waiting.
+
+    The stock QueueHandler formats the message in the logging thread, which
+    is exactly the work we want to move off the main loop. If the queue is
+    full, the record is dropped and counted instead of blocking.
+    """
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        """Create the handler for the given queue."""
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Pass the record on as is; it's formatted by the listener thread."""
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Put the record in the queue, dropping it if the queue is full."""
+        if self.dropped:
+            dropped = logging.LogRecord(
+                record.name,
+                logging.WARNING,
+                __file__,
+                0,
+                "Log queue was full, dropped %s records!",
+                (self.dropped,),
+                None,
+            )
+            try:
+                self.queue.put_nowait(dropped)
+                self.dropped = 0
+            except queue.Full:
+                pass
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class CollapsingHandler(logging.Handler):
+    """Forward records to other handlers, collapsing repeated warnings.
+
+    Records count as repeats when they come from the same place with the same
+    message template, whatever the arguments. The first one is passed on,
+    the rest are counted until the window is over and then reported in a
+    single summary record.
+    """
+
+    def __init__(self, handlers: List[logging.Handler], window: float) -> None:
+        """Create the handler, forwarding to the given handlers."""
+        super().__init__()
+        self.handlers = handlers
+        self.window = window
+        # (level, template, path, line) -> [window start, repeats, last record]
+        self.seen: Dict[Tuple, list] = {}
+
+    def _forward(self, record: logging.LogRecord) -> None:
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def flush_summaries(self, now: float, force: bool = False) -> None:
+        """Report and forget the repeats of the windows that are over."""
+        for key, (started_at, repeats, last_record) in list(self.seen.items()):
+            if not force and now - started_at < self.window:
+                continue
+            del self.seen[key]
+            if repeats:
+                summary = logging.makeLogRecord(last_record.__dict__)
+                summary.msg = f"{last_record.getMessage()} (repeated {repeats} more times)"
+                summary.args = None
+                summary.exc_info = None
+                summary.exc_text = None
+                self._forward(summary)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Forward the record, unless it's a repeat within the window."""
+        now = time.monotonic()
+        self.flush_summaries(now)
+
+        if record.levelno != COLLAPSE_LEVEL:
+            self._forward(record)
+            return
+
+        key = (record.levelno, str(record.msg), record.pathname, record.lineno)
+        if key in self.seen:
+            self.seen[key][1] += 1
+            self.seen[key][2] = record
+            return
+        self.seen[key] = [now, 0, record]
+        self._forward(record)
+
+    def flush(self) -> None:
+        """Report all outstanding repeats and flush the target handlers."""
+        self.flush_summaries(time.monotonic(), force=True)
+        for handler in self.handlers:
+            handler.flush()
+
+
+class FlushingQueueListener(QueueListener):
+    """A queue listener that flushes its handlers when stopped."""
+
+    def stop(self) -> None:
+        """Process the records left in the queue, then flush the handlers."""
+        super().stop()
+        for handler in self.handlers:
+            handler.flush()
+
+
+def start_log_pipeline(
+    handlers: List[logging.Handler], queue_size: int, collapse_window: float
+) -> QueueListener:
+    """Route all logging of the root logger through the queue to the given handlers.
+
+    :returns: The started listener; call `stop` on it to flush the queue.
+    """
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    collapser = CollapsingHandler(handlers, collapse_window)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(NonBlockingQueueHandler(log_queue))
+
+    listener = FlushingQueueListener(log_queue, collapser)
+    listener.start()
+    return listener
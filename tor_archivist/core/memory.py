@@ -0,0 +1,125 @@
+"""Memory instrumentation for spotting leaks in the long-running process.
+
+When enabled, the memory is measured after every cycle and published as
+metrics. Every few cycles a tracemalloc snapshot is taken and the lines that
+allocated the most new memory since the previous snapshot are logged.
+"""
+import gc
+import logging
+import os
+import sys
+import tracemalloc
+from collections import deque
+from typing import Deque, Optional, Sequence
+
+from tor_archivist.core import metrics
+
+# Allocations by the instrumentation itself aren't interesting
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+]
+
+
+# How many cycles the growth is estimated over
+GROWTH_WINDOW = 50
+
+
+class MemoryGrowthError(Exception):
+    """Memory grew by more than the allowed amount per cycle."""
+
+
+def get_rss_bytes() -> int:
+    """Return the resident set size of the process.
+
+    Uses the current value from /proc where available, otherwise falls back
+    to the peak reported by getrusage.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def growth_per_cycle(samples: Sequence[int]) -> float:
+    """Return the memory growth per cycle, as the slope of a least squares fit."""
+    count = len(samples)
+    if count < 2:
+        return 0.0
+    mean_x = (count - 1) / 2
+    mean_y = sum(samples) / count
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(samples))
+    variance = sum((x - mean_x) ** 2 for x in range(count))
+    return covariance / variance
+
+
+def check_memory_growth(samples: Sequence[int], limit: float) -> None:
+    """Raise if the memory grew by more than the limit per cycle.
+
+    :raises MemoryGrowthError: If the growth per cycle is over the limit.
+    """
+    growth = growth_per_cycle(samples)
+    if growth > limit:
+        raise MemoryGrowthError(
+            f"Memory grew by {growth:.0f} bytes per cycle over {len(samples)} cycles"
+            f" (limit is {limit:.0f})"
+        )
+
+
+class MemoryMonitor:
+    """Measures the memory after every cycle and logs where it's growing."""
+
+    def __init__(self, snapshot_every: int, top: int = 10) -> None:
+        """Start tracing the allocations."""
+        self.snapshot_every = snapshot_every
+        self.top = top
+        self.cycles = 0
+        # Traced memory after each of the last cycles
+        self.samples: Deque[int] = deque(maxlen=GROWTH_WINDOW)
+        self.previous: Optional[tracemalloc.Snapshot] = None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def record_cycle(self) -> None:
+        """Measure the memory at the end of a cycle."""
+        self.cycles += 1
+        traced, peak = tracemalloc.get_traced_memory()
+        self.samples.append(traced)
+
+        metrics.set_gauge("memory_rss_bytes", get_rss_bytes())
+        metrics.set_gauge("memory_traced_bytes", traced)
+        metrics.set_gauge("memory_traced_peak_bytes", peak)
+        metrics.set_gauge("memory_growth_per_cycle_bytes", growth_per_cycle(self.samples))
+        metrics.set_gauge("gc_objects", len(gc.get_objects()))
+        metrics.set_gauge("gc_garbage", len(gc.garbage))
+
+        if self.cycles % self.snapshot_every == 0:
+            self.log_top_growth()
+
+    def log_top_growth(self) -> None:
+        """Take a snapshot and log the lines that allocated the most since the last one."""
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        if self.previous is not None:
+            stats = snapshot.compare_to(self.previous, "lineno")
+            growing = [stat for stat in stats if stat.size_diff > 0][: self.top]
+            logging.info(
+                "Memory after %s cycles: %.1f MiB RSS, top growth since last snapshot:",
+                self.cycles,
+                get_rss_bytes() / 2**20,
+            )
+            for stat in growing:
+                frame = stat.traceback[0]
+                logging.info(
+                    "  %s:%s: +%.1f KiB (%+d blocks)",
+                    frame.filename,
+                    frame.lineno,
+                    stat.size_diff / 1024,
+                    stat.count_diff,
+                )
+        self.previous = snapshot
@@ -0,0 +1,46 @@
+"""A minimal registry of the bot's metrics.
+
+The values live in memory and can be dumped to a JSON file after every
+cycle (see METRICS_FILE), where whatever monitoring we run can pick them up.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Union
+
+Number = Union[int, float]
+
+_lock = threading.Lock()
+_metrics: Dict[str, Number] = {}
+
+
+def set_gauge(name: str, value: Number) -> None:
+    """Set the metric to the given value."""
+    with _lock:
+        _metrics[name] = value
+
+
+def inc(name: str, amount: Number = 1) -> None:
+    """Increase the counter by the given amount."""
+    with _lock:
+        _metrics[name] = _metrics.get(name, 0) + amount
+
+
+def get_metrics() -> Dict[str, Number]:
+    """Return a copy of all metrics."""
+    with _lock:
+        return dict(_metrics)
+
+
+def write_metrics(path: str) -> None:
+    """Write all metrics to the given file, replacing it atomically."""
+    data = {"timestamp": time.time(), "metrics": get_metrics()}
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w") as metrics_file:
+            json.dump(data, metrics_file, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.warning("Could not write metrics to %s: %s", path, e)
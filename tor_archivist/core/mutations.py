@@ -0,0 +1,263 @@
+"""Batching of the changes the archivist makes to Blossom submissions.
+
+Removing, approving, reporting, marking as NSFW and archiving used to be one
+blocking PATCH per submission. They are now collected for a short window and
+sent per action type, to the bulk endpoint `submission/bulk/<action>` when
+Blossom has one:
+
+    PATCH submission/bulk/remove  ids=1&ids=2  ->  {"1": 200, "2": 404}
+
+When Blossom doesn't know the bulk endpoint (404 or 405), the batch falls
+back to the regular single-submission calls, sent a few at a time in
+parallel. The same happens when the bulk call itself fails, is answered
+with an error or its answer can't be read, so no change is lost. Either
+way, the result of every submission is logged as before.
+
+A batch is sent once it's full, or at the latest when its window is over,
+even if nothing else is submitted in the meantime.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from tor_archivist.core.records import BlossomSubmission
+
+
+class Action(NamedTuple):
+    """How to apply one type of change and how to log the outcome."""
+
+    # Send the change for a single submission, returns the response
+    send: Callable[[Any, BlossomSubmission, Optional[str]], Any]
+    # Update our own record after the change went through
+    apply: Callable[[BlossomSubmission, Optional[str]], None]
+    success_message: str
+    failure_message: str
+
+
+def _patch(endpoint: str) -> Callable[[Any, BlossomSubmission, Optional[str]], Any]:
+    def send(blossom: Any, b_submission: BlossomSubmission, reason: Optional[str]) -> Any:
+        data = {"reason": reason} if reason is not None else None
+        return blossom.patch(f"submission/{b_submission.id}/{endpoint}", data=data)
+
+    return send
+
+
+def _archive(blossom: Any, b_submission: BlossomSubmission, reason: Optional[str]) -> Any:
+    return blossom.archive_submission(submission_id=b_submission.id)
+
+
+def _mark(attribute: str) -> Callable[[BlossomSubmission, Optional[str]], None]:
+    def apply(b_submission: BlossomSubmission, reason: Optional[str]) -> None:
+        setattr(b_submission, attribute, True)
+
+    return apply
+
+
+def _set_report_reason(b_submission: BlossomSubmission, reason: Optional[str]) -> None:
+    b_submission.report_reason = reason
+
+
+def _keep(b_submission: BlossomSubmission, reason: Optional[str]) -> None:
+    # Archived submissions are not tracked on the record
+    pass
+
+
+ACTIONS: Dict[str, Action] = {
+    "remove": Action(
+        _patch("remove"),
+        _mark("removed_from_queue"),
+        "Removed submission %s (%s) from Blossom.",
+        "Failed to remove submission %s (%s) from Blossom! (%s)",
+    ),
+    "approve": Action(
+        _patch("approve"),
+        _mark("approved"),
+        "Approved submission %s (%s) on Blossom.",
+        "Failed to approve submission %s (%s) on Blossom! (%s)",
+    ),
+    "nsfw": Action(
+        _patch("nsfw"),
+        _mark("nsfw"),
+        "Submission %s (%s) marked as NSFW on Blossom.",
+        "Failed to mark submission %s (%s) as NSFW on Blossom! (%s)",
+    ),
+    "report": Action(
+        _patch("report"),
+        _set_report_reason,
+        "Reported submission %s (%s) to Blossom.",
+        "Failed to report submission %s (%s) to Blossom! (%s)",
+    ),
+    "archive": Action(
+        _archive,
+        _keep,
+        "Archived submission %s (%s) on Blossom.",
+        "Failed to archive submission %s (%s) on Blossom! (%s)",
+    ),
+}
+
+
+def response_outcome(response: Any) -> Tuple[bool, Any]:
+    """Return whether the call succeeded and the status to log.
+
+    The raw calls return a requests response, the wrapper methods a
+    BlossomResponse with a status enum.
+    """
+    if hasattr(response, "status_code"):
+        return response.ok, response.status_code
+    status = getattr(response, "status", None)
+    return getattr(status, "name", "ok") == "ok", status
+
+
+class MutationBatcher:
+    """Collects changes to Blossom submissions and sends them in batches."""
+
+    def __init__(self, blossom: Any, window: float, max_batch: int, concurrency: int) -> None:
+        """Create an empty batcher for the given Blossom connection."""
+        self.blossom = blossom
+        self.window = window
+        self.max_batch = max_batch
+        self.concurrency = concurrency
+        # (action, reason) -> submissions waiting for that change
+        self.pending: Dict[Tuple[str, Optional[str]], List[BlossomSubmission]] = defaultdict(list)
+        self.pending_count = 0
+        self.pending_since = 0.0
+        self.lock = threading.Lock()
+        # Sends the pending batch when its window is over
+        self.timer: Optional[threading.Timer] = None
+        # Whether Blossom has the bulk endpoint of the action; None if we don't know yet
+        self.bulk_supported: Dict[str, Optional[bool]] = {action: None for action in ACTIONS}
+
+    def submit(
+        self, action: str, b_submission: BlossomSubmission, reason: Optional[str] = None
+    ) -> None:
+        """Queue a change, sending the batch if it's full or the window is over."""
+        with self.lock:
+            if self.pending_count == 0:
+                self.pending_since = time.monotonic()
+                self._start_timer()
+            self.pending[(action, reason)].append(b_submission)
+            self.pending_count += 1
+            send_now = (
+                self.pending_count >= self.max_batch
+                or time.monotonic() - self.pending_since >= self.window
+            )
+        if send_now:
+            self.flush()
+
+    def _start_timer(self) -> None:
+        """Flush the batch that was just started once its window is over."""
+        if self.window <= 0:
+            return
+        self.timer = threading.Timer(self.window, self._flush_on_timer)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def _flush_on_timer(self) -> None:
+        try:
+            self.flush()
+        except Exception:
+            logging.exception("Failed to send the pending changes to Blossom!")
+
+    def flush(self) -> Dict[Tuple[str, Any], bool]:
+        """Send all pending changes.
+
+        :returns: Whether each change went through, by action and submission ID.
+        """
+        with self.lock:
+            pending, self.pending = self.pending, defaultdict(list)
+            self.pending_count = 0
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+        results = {}
+        for (action, reason), b_submissions in pending.items():
+            outcomes = None
+            if self.bulk_supported[action] is not False:
+                outcomes = self._send_bulk(action, reason, b_submissions)
+            if outcomes is None:
+                outcomes = self._send_individually(action, reason, b_submissions)
+
+            for b_submission, (ok, status) in zip(b_submissions, outcomes):
+                self._log_outcome(action, reason, b_submission, ok, status)
+                results[(action, b_submission.id)] = ok
+        return results
+
+    def _send_bulk(
+        self, action: str, reason: Optional[str], b_submissions: List[BlossomSubmission]
+    ) -> Optional[List[Tuple[bool, Any]]]:
+        """Send the changes through the bulk endpoint.
+
+        :returns: The outcome per submission, or None if the changes have to be
+            sent one by one instead.
+        """
+        data: Dict[str, Any] = {"ids": [b_submission.id for b_submission in b_submissions]}
+        if reason is not None:
+            data["reason"] = reason
+        try:
+            response = self.blossom.patch(f"submission/bulk/{action}", data=data)
+        except Exception as e:
+            logging.warning("Bulk %s failed, sending them one by one. (%s)", action, e)
+            return None
+
+        if response.status_code in (404, 405):
+            if self.bulk_supported[action] is None:
+                logging.info("Blossom has no bulk %s endpoint, sending them one by one.", action)
+            self.bulk_supported[action] = False
+            return None
+        if not response.ok:
+            logging.warning(
+                "Bulk %s failed with status %s, sending them one by one.",
+                action,
+                response.status_code,
+            )
+            return None
+        self.bulk_supported[action] = True
+
+        try:
+            statuses = response.json()
+        except ValueError:
+            statuses = None
+        if not isinstance(statuses, dict):
+            logging.warning("Unexpected answer to bulk %s, sending them one by one.", action)
+            return None
+        outcomes = []
+        for b_submission in b_submissions:
+            status = statuses.get(str(b_submission.id))
+            outcomes.append((status is not None and 200 <= status < 300, status))
+        return outcomes
+
+    def _send_individually(
+        self, action: str, reason: Optional[str], b_submissions: List[BlossomSubmission]
+    ) -> List[Tuple[bool, Any]]:
+        """Send the changes one submission at a time, a few in parallel."""
+        send = ACTIONS[action].send
+
+        def send_one(b_submission: BlossomSubmission) -> Tuple[bool, Any]:
+            try:
+                return response_outcome(send(self.blossom, b_submission, reason))
+            except Exception as e:
+                return False, e
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            return list(pool.map(send_one, b_submissions))
+
+    def _log_outcome(
+        self,
+        action: str,
+        reason: Optional[str],
+        b_submission: BlossomSubmission,
+        ok: bool,
+        status: Any,
+    ) -> None:
+        """Log the outcome of a change and update the record if it went through."""
+        if ok:
+            ACTIONS[action].apply(b_submission, reason)
+            logging.info(ACTIONS[action].success_message, b_submission.id, b_submission.tor_url)
+        else:
+            logging.warning(
+                ACTIONS[action].failure_message, b_submission.id, b_submission.tor_url, status
+            )
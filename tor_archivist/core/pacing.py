@@ -0,0 +1,74 @@
+"""Adaptive pacing of the main loop.
+
+When the mod queue and mod log are busy, the bot polls more often; when
+they're quiet it backs off to the regular update delay. Errors back off
+exponentially with jitter. All the waiting happens on an event, so CTRL+C or
+new work can wake the loop up right away.
+"""
+import random
+import threading
+
+# How much weight the activity of past cycles keeps in the average
+ACTIVITY_DECAY = 0.5
+
+
+class PacingController:
+    """Decides how long the main loop waits between cycles and after errors."""
+
+    def __init__(
+        self,
+        min_interval: float,
+        max_interval: float,
+        backoff_base: float,
+        backoff_max: float,
+    ) -> None:
+        """Create a controller that starts out idle."""
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        # Moving average of the amount of work found per cycle
+        self.activity = 0.0
+        self.consecutive_errors = 0
+        self._wake_event = threading.Event()
+
+    def record_activity(self, count: int) -> None:
+        """Record the amount of work the last cycle found."""
+        self.activity = ACTIVITY_DECAY * self.activity + (1 - ACTIVITY_DECAY) * count
+
+    def next_interval(self) -> float:
+        """Return the time to wait until the next cycle.
+
+        Every unit of recent activity cuts the interval further, down to the
+        minimum.
+        """
+        return max(self.min_interval, self.max_interval / (1 + self.activity))
+
+    def record_success(self) -> None:
+        """Reset the error backoff after a cycle went through."""
+        self.consecutive_errors = 0
+
+    def error_delay(self) -> float:
+        """Return the time to wait after another consecutive error.
+
+        The delay doubles with every consecutive error, up to the maximum. A
+        random part is taken off so that several instances don't retry in
+        lockstep.
+        """
+        self.consecutive_errors += 1
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (self.consecutive_errors - 1))
+        return random.uniform(delay / 2, delay)
+
+    def wait(self, timeout: float) -> bool:
+        """Wait for the given time, unless something wakes us up earlier.
+
+        :returns: True if we were woken up before the time was over.
+        """
+        woken = self._wake_event.wait(max(timeout, 0))
+        self._wake_event.clear()
+        return woken
+
+    def wake(self) -> None:
+        """Interrupt the current (or next) wait right away."""
+        self._wake_event.set()
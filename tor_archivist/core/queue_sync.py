@@ -1,24 +1,27 @@
 """Functionality to sync the Blossom queue with the queue on Reddit."""
 import logging
-import time
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, Optional
+from typing import Any, NamedTuple, Optional
 
 from prawcore import Forbidden
 
 from tor_archivist.core.blossom import (
     approve_on_blossom,
     get_blossom_submission,
+    in_own_shard,
     nsfw_on_blossom,
     remove_on_blossom,
     report_handled_blossom,
     report_on_blossom,
 )
 from tor_archivist.core.config import Config
+from tor_archivist.core.records import BlossomSubmission, SubmissionPage
 from tor_archivist.core.reddit import (
     approve_on_reddit,
+    note_public_subreddit,
     nsfw_on_reddit,
     remove_on_reddit,
+    remove_private_submission,
     report_handled_reddit,
 )
 
@@ -41,7 +44,18 @@ def _get_report_reason(r_submission: Any) -> Optional[str]:
     )
 
 
-def _auto_report_handling(cfg: Config, r_submission: Any, b_submission: Dict, reason: str) -> bool:
+class ReportHandling(NamedTuple):
+    """The outcome of trying to handle a report automatically."""
+
+    # Whether the report was dealt with, so that it doesn't go to Blossom
+    handled: bool
+    # Whether the post was removed or marked as NSFW anywhere
+    changed: bool
+
+
+def _auto_report_handling(
+    cfg: Config, r_submission: Any, b_submission: BlossomSubmission, reason: str
+) -> ReportHandling:
     """Check if the report can be handled automatically.
 
     This is possible in the following cases:
@@ -51,17 +65,23 @@ def _auto_report_handling(cfg: Config, r_submission: Any, b_submission: Dict, re
       been marked as NSFW on the partner sub. If yes, we mark it as
       NSFW on both Reddit and Blossom. Otherwise, we ignore the report.
 
-    :returns: True if the report has been handled automatically, else False.
+    :returns: Whether the report has been handled automatically and whether
+        anything had to be changed for it.
     """
+    changed = False
     try:
         partner_submission = cfg.reddit.submission(url=r_submission.url)
 
         # Check if the post is marked as NSFW on the partner sub
-        if partner_submission.over_18:
+        partner_nsfw = partner_submission.over_18
+        note_public_subreddit(cfg, b_submission)
+        if partner_nsfw:
             if not r_submission.over_18:
                 nsfw_on_reddit(r_submission)
-            if not b_submission["nsfw"]:
+                changed = True
+            if not b_submission.nsfw:
                 nsfw_on_blossom(cfg, b_submission)
+                changed = True
 
         # Check if the post has been removed on the partner sub
         if partner_submission.removed_by_category:
@@ -69,39 +89,42 @@ def _auto_report_handling(cfg: Config, r_submission: Any, b_submission: Dict, re
             # But only do it if the submission is not marked as removed already
             if not r_submission.removed_by_category:
                 remove_on_reddit(r_submission)
-            if not b_submission["removed_from_queue"]:
+                changed = True
+            if not b_submission.removed_from_queue:
                 remove_on_blossom(cfg, b_submission)
+                changed = True
             # We can ignore the report
-            return True
+            return ReportHandling(True, changed)
 
         # Check if the post has been removed by a mod
         if r_submission.removed_by_category:
-            if not b_submission["removed_from_queue"]:
+            if not b_submission.removed_from_queue:
                 remove_on_blossom(cfg, b_submission)
+                changed = True
             # We can ignore the report
-            return True
+            return ReportHandling(True, changed)
 
         if reason == NSFW_POST_REPORT_REASON:
             # We already handled NSFW reports
             # We still need to approve the submission to remove the item from mod queue
             approve_on_reddit(r_submission)
             approve_on_blossom(cfg, b_submission)
-            return True
+            return ReportHandling(True, changed)
 
-        return False
+        return ReportHandling(False, changed)
     except Forbidden:
         # The subreddit is private, remove the post from the queue
-        logging.warning(f"Removing submission from private sub: {b_submission['tor_url']}")
-        if not r_submission.removed_by_category:
-            remove_on_reddit(r_submission)
-        if not b_submission["removed_from_queue"]:
-            remove_on_blossom(cfg, b_submission)
-        return True
+        remove_private_submission(cfg, r_submission, b_submission)
+        return ReportHandling(True, True)
 
 
-def track_post_removal(cfg: Config) -> None:
-    """Process the mod log and sync post removals to Blossom."""
+def track_post_removal(cfg: Config) -> int:
+    """Process the mod log and sync post removals to Blossom.
+
+    :returns: The number of removals that were synced.
+    """
     logging.info("Tracking post removals!")
+    synced = 0
     for log in cfg.tor.mod.log(action="removelink", limit=100):
         mod = log.mod
         tor_url = "https://reddit.com" + log.target_permalink
@@ -113,20 +136,30 @@ def track_post_removal(cfg: Config) -> None:
         # Fetch the corresponding submission from Blossom
         b_submission = get_blossom_submission(cfg, tor_url)
         if b_submission is None:
-            logging.warning(f"Can't find submission {tor_url} in Blossom!")
+            logging.warning("Can't find submission %s in Blossom!", tor_url)
+            continue
+        if not in_own_shard(cfg, b_submission):
             continue
-        b_submission_id = b_submission["id"]
+        b_submission_id = b_submission.id
 
-        if b_submission["removed_from_queue"]:
-            logging.debug(f"Submission {b_submission_id} has already been removed.")
+        if b_submission.removed_from_queue:
+            logging.debug("Submission %s has already been removed.", b_submission_id)
             continue
 
         remove_on_blossom(cfg, b_submission)
+        synced += 1
 
+    return synced
 
-def track_post_reports(cfg: Config) -> None:
-    """Process the mod queue and sync post reports to Blossom."""
+
+def track_post_reports(cfg: Config) -> int:
+    """Process the mod queue and sync post reports to Blossom.
+
+    :returns: The number of new reports that were handled.
+    """
     logging.info("Tracking post reports!")
+    handled = 0
+    reported = set()
     for r_submission in cfg.tor.mod.modqueue(only="submissions", limit=None):
         # Check if the report has already been handled
         if report_handled_reddit(r_submission):
@@ -138,32 +171,62 @@ def track_post_reports(cfg: Config) -> None:
             continue
 
         tor_url = "https://reddit.com" + r_submission.permalink
+        reported.add(tor_url)
 
         # Fetch the corresponding submission from Blossom
         b_submission = get_blossom_submission(cfg, tor_url)
         if b_submission is None:
-            logging.warning(f"Can't find submission {tor_url} in Blossom!")
+            logging.warning("Can't find submission %s in Blossom!", tor_url)
             continue
-        b_id = b_submission["id"]
+        if not in_own_shard(cfg, b_submission):
+            continue
+        b_id = b_submission.id
 
         if report_handled_blossom(b_submission):
-            logging.debug(f"Submission {b_id} has already been removed.")
+            logging.debug("Submission %s has already been removed.", b_id)
             continue
 
+        handled += 1
+
         # Handle the report automatically if possible
         # In that case we don't need to send it to Blossom
-        if _auto_report_handling(cfg, r_submission, b_submission, reason):
+        if _auto_report_handling(cfg, r_submission, b_submission, reason).handled:
             continue
 
         report_on_blossom(cfg, b_submission, reason)
 
+    # The full queue sync checks these first
+    cfg.sync_stats.pending_reports = reported
+    return handled
+
+
+def sync_submission(cfg: Config, b_submission: BlossomSubmission, reason: str = "") -> bool:
+    """Make sure a single submission in Blossom's queue still exists in Reddit.
+
+    :returns: True if the submission was removed or marked as NSFW, else False.
+    """
+    logging.info("Syncing up Blossom queue for %s", b_submission.tor_url)
+    r_submission = cfg.reddit.submission(url=b_submission.tor_url)
+    changed = _auto_report_handling(cfg, r_submission, b_submission, reason).changed
+    cfg.sync_stats.record(b_submission, changed)
+    return changed
+
 
 def full_blossom_queue_sync(cfg: Config) -> None:
-    """Make sure all posts in Blossom's queue still exist in Reddit."""
-    queue_start = datetime.now(tz=timezone.utc) - QUEUE_TIMEOUT
+    """Make sure all posts in Blossom's queue still exist in Reddit.
+
+    The whole queue is fetched first, so that the riskiest submissions can be
+    checked first, see `SyncStats`.
+    """
+    # Rounded down to the hour, so that the page URLs stay the same between
+    # syncs and the unchanged pages can be answered from the HTTP cache.
+    queue_start = (datetime.now(tz=timezone.utc) - QUEUE_TIMEOUT).replace(
+        minute=0, second=0, microsecond=0
+    )
 
     size = 500
     page = 1
+    b_submissions = []
 
     # Fetch all unclaimed posts from the queue
     while True:
@@ -178,18 +241,23 @@ def full_blossom_queue_sync(cfg: Config) -> None:
             },
         )
         if not queue_response.ok:
-            logging.error(f"Failed to get queue from Blossom:\n{queue_response}")
-            return
+            logging.error("Failed to get queue from Blossom:\n%s", queue_response)
+            # Still sync the pages we've got
+            break
 
-        data = queue_response.json()["results"]
+        queue_page = SubmissionPage.from_response(queue_response)
         page += 1
 
-        # Sync up the queue submissions
-        for b_submission in data:
-            logging.info(f"Syncing up Blossom queue for {b_submission['tor_url']}")
-            r_submission = cfg.reddit.submission(url=b_submission["tor_url"])
-            _auto_report_handling(cfg, r_submission, b_submission, "")
-            time.sleep(1)
+        # Unchanged pages are still synced: Blossom's side of the submissions
+        # didn't change, but the posts on Reddit may have.
+        for b_submission in queue_page.results:
+            cfg.records.put(b_submission)
+            if in_own_shard(cfg, b_submission):
+                b_submissions.append(b_submission)
 
-        if len(data) < size or queue_response.json()["next"] is None:
+        if len(queue_page.results) < size or queue_page.next is None:
             break
+
+    # Sync up the queue submissions, the riskiest first
+    for b_submission in cfg.sync_stats.prioritize(b_submissions, QUEUE_TIMEOUT.total_seconds()):
+        sync_submission(cfg, b_submission)
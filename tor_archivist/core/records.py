@@ -0,0 +1,233 @@
+"""Compact records of the Blossom objects the archivist works with.
+
+Blossom returns a lot more than we need for every submission, and pages of
+up to 500 of them. Instead of keeping the decoded JSON around, only the
+handful of fields the archivist reads are kept, in slotted objects. The body
+of a page is still read in full, but it's decoded one submission at a time,
+so the nested dicts of a whole page never exist at the same time.
+"""
+import json
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r"[ \t\n\r]*")
+
+
+class BlossomSubmission:
+    """The fields of a Blossom submission that the archivist uses."""
+
+    __slots__ = (
+        "id",
+        "tor_url",
+        "url",
+        "create_time",
+        "nsfw",
+        "removed_from_queue",
+        "approved",
+        "report_reason",
+        "completed_by",
+        "archived",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        tor_url: str,
+        url: Optional[str] = None,
+        create_time: Optional[str] = None,
+        nsfw: bool = False,
+        removed_from_queue: bool = False,
+        approved: bool = False,
+        report_reason: Optional[str] = None,
+        completed_by: Optional[str] = None,
+        archived: bool = False,
+    ) -> None:
+        """Create a new submission record."""
+        self.id = id
+        self.tor_url = tor_url
+        self.url = url
+        self.create_time = create_time
+        self.nsfw = nsfw
+        self.removed_from_queue = removed_from_queue
+        self.approved = approved
+        self.report_reason = report_reason
+        self.completed_by = completed_by
+        self.archived = archived
+
+    @classmethod
+    def from_json(cls, data: Dict) -> "BlossomSubmission":
+        """Create a record from a submission as returned by the Blossom API."""
+        return cls(
+            id=data["id"],
+            tor_url=data["tor_url"],
+            url=data.get("url"),
+            create_time=data.get("create_time"),
+            nsfw=bool(data.get("nsfw")),
+            removed_from_queue=bool(data.get("removed_from_queue")),
+            # These are not exposed to the API yet
+            # But it doesn't hurt to read them and it'll work if we ever expose them
+            approved=bool(data.get("approved")),
+            report_reason=data.get("report_reason"),
+            completed_by=data.get("completed_by"),
+            archived=bool(data.get("archived")),
+        )
+
+    @property
+    def created_at(self) -> Optional[datetime]:
+        """When the submission was created, if known."""
+        if not self.create_time:
+            return None
+        try:
+            return datetime.fromisoformat(self.create_time.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+
+    @property
+    def subreddit(self) -> Optional[str]:
+        """The name of the partner subreddit the post is from, if known."""
+        parts = list(filter(None, urlparse(self.url or "").path.split("/")))
+        if len(parts) < 2 or parts[0] != "r":
+            return None
+        return parts[1].casefold()
+
+    def to_json(self) -> Dict:
+        """Return the record in the same shape as the Blossom API, for `from_json`."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"<BlossomSubmission {self.id} {self.tor_url}>"
+
+
+class RecordCache:
+    """The Blossom submissions seen recently, by ToR URL.
+
+    Saves asking Blossom for the same submission cycle after cycle. The
+    records are updated in place when we change them, but changes made by
+    others only show up once the entry expires or the full queue sync sees
+    the submission again.
+    """
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        """Create an empty cache."""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, Tuple[float, BlossomSubmission]]" = OrderedDict()
+
+    def get(self, tor_url: str) -> Optional[BlossomSubmission]:
+        """Return the cached submission, if there is a fresh one."""
+        entry = self.entries.get(tor_url)
+        if entry is None:
+            return None
+        cached_at, b_submission = entry
+        if time.time() - cached_at >= self.ttl:
+            del self.entries[tor_url]
+            return None
+        return b_submission
+
+    def put(self, b_submission: BlossomSubmission, cached_at: Optional[float] = None) -> None:
+        """Remember the submission, dropping the oldest entries if the cache is full."""
+        self.entries[b_submission.tor_url] = (cached_at or time.time(), b_submission)
+        self.entries.move_to_end(b_submission.tor_url)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def to_json(self) -> List:
+        """Return the fresh entries as `[cached_at, submission]` pairs."""
+        now = time.time()
+        return [
+            [cached_at, b_submission.to_json()]
+            for cached_at, b_submission in self.entries.values()
+            if now - cached_at < self.ttl
+        ]
+
+    def load_json(self, data: List) -> None:
+        """Add the entries returned by `to_json`, skipping the expired ones."""
+        now = time.time()
+        for cached_at, b_submission in data:
+            if now - cached_at < self.ttl:
+                self.put(BlossomSubmission.from_json(b_submission), cached_at)
+
+
+class SubmissionPage:
+    """A page of submissions from one of the Blossom list endpoints."""
+
+    __slots__ = ("results", "next", "count")
+
+    def __init__(
+        self, results: List[BlossomSubmission], next: Optional[str], count: Optional[int]
+    ) -> None:
+        """Create a new page."""
+        self.results = results
+        self.next = next
+        self.count = count
+
+    @classmethod
+    def from_response(cls, response: Any) -> "SubmissionPage":
+        """Decode the page from the body of a Blossom response.
+
+        Handles both the paginated endpoints and the ones returning a plain
+        list of submissions. The body isn't streamed: the HTTP cache keeps the
+        whole body anyway, so only the decoding is done incrementally.
+        """
+        # JSON is always UTF-8; decoding it ourselves saves requests from
+        # guessing the encoding of the whole body.
+        return cls.decode(response.content.decode("utf-8"))
+
+    @classmethod
+    def decode(cls, text: str) -> "SubmissionPage":
+        """Decode the page from the given JSON text."""
+        pos = _skip_whitespace(text, 0)
+        if text.startswith("[", pos):
+            results, _ = _decode_array(text, pos, BlossomSubmission.from_json)
+            return cls(results, None, len(results))
+
+        values: Dict[str, Any] = {}
+        results = []
+        pos = _expect(text, pos, "{")
+        while not text.startswith("}", pos):
+            key, pos = _decoder.raw_decode(text, pos)
+            pos = _expect(text, pos, ":")
+            if key == "results":
+                results, pos = _decode_array(text, pos, BlossomSubmission.from_json)
+            else:
+                values[key], pos = _decoder.raw_decode(text, pos)
+            pos = _skip_whitespace(text, pos)
+            if text.startswith(",", pos):
+                pos = _skip_whitespace(text, pos + 1)
+        return cls(results, values.get("next"), values.get("count"))
+
+
+def _skip_whitespace(text: str, pos: int) -> int:
+    return _whitespace.match(text, pos).end()
+
+
+def _expect(text: str, pos: int, char: str) -> int:
+    """Skip over the given character, returning the position of the next token."""
+    pos = _skip_whitespace(text, pos)
+    if not text.startswith(char, pos):
+        raise ValueError(f"Expected {char!r} at position {pos} of Blossom response")
+    return _skip_whitespace(text, pos + 1)
+
+
+def _decode_array(text: str, pos: int, convert: Callable[[Any], Any]) -> Tuple[List, int]:
+    """Decode the JSON array at the position, converting each item as soon as it's decoded.
+
+    :returns: The converted items and the position right after the array.
+    """
+    items = []
+    pos = _expect(text, pos, "[")
+    while not text.startswith("]", pos):
+        item, pos = _decoder.raw_decode(text, pos)
+        items.append(convert(item))
+        pos = _skip_whitespace(text, pos)
+        if text.startswith(",", pos):
+            pos = _skip_whitespace(text, pos + 1)
+    return items, pos + 1
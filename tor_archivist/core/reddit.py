@@ -1,6 +1,32 @@
 import logging
+import time
 from typing import Any
 
+from prawcore import Requestor
+from requests import Response
+
+from tor_archivist import PRIVATE_SUBREDDIT_TTL_SEC
+from tor_archivist.core.blossom import remove_on_blossom
+from tor_archivist.core.concurrency import AdaptiveLimiter
+from tor_archivist.core.config import Config
+from tor_archivist.core.records import BlossomSubmission
+
+
+class LimitedRequestor(Requestor):
+    """A PRAW requestor that sends every request through a limiter.
+
+    Passed to PRAW as `requestor_class`, with the limiter in `requestor_kwargs`.
+    """
+
+    def __init__(self, *args: Any, limiter: AdaptiveLimiter, **kwargs: Any) -> None:
+        """Create the requestor; the remaining arguments are passed on to PRAW's."""
+        super().__init__(*args, **kwargs)
+        self.limiter = limiter
+
+    def request(self, *args: Any, **kwargs: Any) -> Response:
+        """Issue the HTTP request once the limiter has a free slot."""
+        return self.limiter.run(super().request, *args, **kwargs)
+
 
 def report_handled_reddit(r_submission: Any) -> bool:
     """Determine if the report is already handled on Reddit."""
@@ -10,17 +36,55 @@ def report_handled_reddit(r_submission: Any) -> bool:
 def remove_on_reddit(r_submission: Any) -> None:
     """Remove the given submission from Reddit."""
     r_submission.mod.remove()
-    logging.info(f"Removed submission {r_submission.url} from Reddit.")
+    logging.info("Removed submission %s from Reddit.", r_submission.url)
 
 
 def approve_on_reddit(r_submission: Any) -> None:
     """Approve the given submission on Reddit."""
     r_submission.mod.approve()
     r_submission.mod.ignore_reports()
-    logging.info(f"Approved submission {r_submission.url} on Reddit.")
+    logging.info("Approved submission %s on Reddit.", r_submission.url)
 
 
 def nsfw_on_reddit(r_submission: Any) -> None:
     """Mark the submission as NSFW on Reddit."""
     r_submission.mod.nsfw()
-    logging.info(f"Submission {r_submission.url} marked as NSFW on Reddit.")
+    logging.info("Submission %s marked as NSFW on Reddit.", r_submission.url)
+
+
+def is_private_subreddit(cfg: Config, b_submission: BlossomSubmission) -> bool:
+    """Determine if the post is from a subreddit we recently found to be private.
+
+    This is only what we saw last; subreddits go private and public again
+    all the time, so posts are never removed based on it.
+    """
+    found_at = cfg.private_subreddits.get(b_submission.subreddit)
+    return found_at is not None and time.time() - found_at < PRIVATE_SUBREDDIT_TTL_SEC
+
+
+def note_public_subreddit(cfg: Config, b_submission: BlossomSubmission) -> None:
+    """Forget that the post's subreddit was private, as Reddit just showed us the post."""
+    subreddit = b_submission.subreddit
+    if cfg.private_subreddits.pop(subreddit, None) is not None:
+        logging.info("Subreddit r/%s is public again.", subreddit)
+
+
+def remove_private_submission(
+    cfg: Config, r_submission: Any, b_submission: BlossomSubmission
+) -> None:
+    """Remove a submission of a private partner subreddit from the queue.
+
+    Only call this when Reddit refused to show us the partner post. The
+    subreddit is remembered, so that going private is only logged once.
+    """
+    subreddit = b_submission.subreddit
+    if subreddit is not None:
+        if not is_private_subreddit(cfg, b_submission):
+            logging.info("Subreddit r/%s is private.", subreddit)
+        cfg.private_subreddits[subreddit] = time.time()
+
+    logging.warning("Removing submission from private sub: %s", b_submission.tor_url)
+    if not r_submission.removed_by_category:
+        remove_on_reddit(r_submission)
+    if not b_submission.removed_from_queue:
+        remove_on_blossom(cfg, b_submission)
@@ -0,0 +1,274 @@
+"""The main loop of the archivist bot."""
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from tor_archivist import (
+    ARCHIVING_RUN_STEPS,
+    CLEAR_THE_QUEUE_MODE,
+    DISABLE_COMPLETED_ARCHIVING,
+    DISABLE_EXPIRED_ARCHIVING,
+    DISABLE_POST_REMOVAL_TRACKING,
+    DISABLE_POST_REPORT_TRACKING,
+    METRICS_FILE,
+    SNAPSHOT_FILE,
+    UPDATE_DELAY_SEC,
+    WEBHOOK_SWEEP_INTERVAL_SEC,
+)
+from tor_archivist.core import STAGE_NAMES, metrics
+from tor_archivist.core.archiving import (
+    archive_completed_posts,
+    archive_completed_submission,
+    archive_expired_submission,
+    drain_archive_queue,
+    process_expired_posts,
+)
+from tor_archivist.core.blossom import get_blossom_submission_by_id, in_own_shard
+from tor_archivist.core.clear_the_queue import clear_the_queue
+from tor_archivist.core.config import Config
+from tor_archivist.core.queue_sync import (
+    QUEUE_TIMEOUT,
+    full_blossom_queue_sync,
+    sync_submission,
+    track_post_removal,
+    track_post_reports,
+)
+from tor_archivist.core.records import BlossomSubmission
+from tor_archivist.core.snapshot import maybe_save_snapshot
+from tor_archivist.core.webhook import WebhookEvent
+
+
+def archive_expired_posts(cfg: Config) -> None:
+    """Archive the expired posts, in bulk when clearing the queue."""
+    if CLEAR_THE_QUEUE_MODE:
+        clear_the_queue(cfg)
+    else:
+        process_expired_posts(cfg)
+
+
+STAGES: Dict[str, Callable[[Config], Any]] = {
+    "completed": archive_completed_posts,
+    "expired": archive_expired_posts,
+    "sync": full_blossom_queue_sync,
+    "removals": track_post_removal,
+    "reports": track_post_reports,
+}
+
+
+class StageResult(NamedTuple):
+    """The outcome of running a single stage once."""
+
+    name: str
+    duration: float
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the stage finished without raising."""
+        return self.error is None
+
+
+def mark_synced(cfg: Config, name: str) -> None:
+    """Remember that the stage just finished."""
+    cfg.last_sync[name] = time.time()
+    metrics.set_gauge(f"last_sync_{name}", cfg.last_sync[name])
+
+
+def run_stages(cfg: Config, names: Iterable[str]) -> List[StageResult]:
+    """Run each of the given stages exactly once, in the regular cycle order.
+
+    A failing stage doesn't stop the remaining ones; the error is logged and
+    reported in its result instead.
+    """
+    selected = set(names)
+    results = []
+    for name in STAGE_NAMES:
+        if name not in selected:
+            continue
+        logging.info("Running stage %s...", name)
+        start = time.monotonic()
+        error = None
+        try:
+            STAGES[name](cfg)
+            if cfg.mutations:
+                cfg.mutations.flush()
+            mark_synced(cfg, name)
+        except Exception as e:
+            logging.exception("Stage %s failed!", name)
+            error = e
+        results.append(StageResult(name, time.monotonic() - start, error))
+    return results
+
+
+def _handle_reported(cfg: Config, b_submission: BlossomSubmission, event: WebhookEvent) -> None:
+    # The reason in the event isn't trusted; the actual report is picked up
+    # from the mod queue. Syncing only acts on what Reddit says about the post.
+    cfg.sync_stats.pending_reports.add(b_submission.tor_url)
+    sync_submission(cfg, b_submission)
+
+
+def _is_expired(b_submission: BlossomSubmission) -> bool:
+    created_at = b_submission.created_at
+    return (
+        b_submission.completed_by is None
+        and created_at is not None
+        and datetime.now(tz=timezone.utc) - created_at >= QUEUE_TIMEOUT
+    )
+
+
+# How to handle each type of webhook event, for a single submission
+WEBHOOK_HANDLERS: Dict[str, Callable[[Config, BlossomSubmission, WebhookEvent], None]] = {
+    "completed": lambda cfg, b_submission, event: archive_completed_submission(cfg, b_submission),
+    "expired": lambda cfg, b_submission, event: archive_expired_submission(cfg, b_submission),
+    "reported": _handle_reported,
+}
+
+# Whether the submission, as Blossom has it, is in the state the event claims
+WEBHOOK_STATE_CHECKS: Dict[str, Callable[[BlossomSubmission], bool]] = {
+    "completed": lambda b_submission: b_submission.completed_by is not None,
+    "expired": _is_expired,
+    "reported": lambda b_submission: True,
+}
+
+
+def handle_webhook_events(cfg: Config) -> int:
+    """Do the work for the submissions the webhook told us about.
+
+    The events are only hints: every submission is fetched from Blossom again,
+    and events that don't match its state there are ignored.
+
+    :returns: The number of events handled.
+    """
+    handled = 0
+    event = cfg.webhook.next_event()
+    while event is not None:
+        b_submission = get_blossom_submission_by_id(cfg, event.submission_id)
+        if b_submission is None:
+            logging.warning("Can't find submission %s in Blossom!", event.submission_id)
+        elif (
+            b_submission.archived
+            or b_submission.removed_from_queue
+            or not WEBHOOK_STATE_CHECKS[event.kind](b_submission)
+        ):
+            logging.warning(
+                "Ignoring %s event for submission %s, it doesn't match its state in Blossom",
+                event.kind,
+                b_submission.id,
+            )
+        elif in_own_shard(cfg, b_submission):
+            logging.info("Handling %s event for submission %s", event.kind, b_submission.id)
+            WEBHOOK_HANDLERS[event.kind](cfg, b_submission, event)
+            handled += 1
+        else:
+            logging.debug(
+                "Skipping %s event for submission %s, it's in another shard",
+                event.kind,
+                b_submission.id,
+            )
+        event = cfg.webhook.next_event()
+
+    if handled:
+        cfg.mutations.flush()
+        drain_archive_queue(cfg)
+    metrics.inc("webhook_events_total", handled)
+    return handled
+
+
+def run_noop(cfg: Config) -> None:
+    """Pretend to do work, but don't actually do it."""
+    # CTRL+C interrupts the wait, so we can shut down right away
+    if cfg.pacing.wait(10):
+        return
+    logging.info("Loop!")
+
+
+def run(cfg: Config) -> None:
+    """Run the bot indefinitely."""
+    if not CLEAR_THE_QUEUE_MODE and cfg.sleep_until >= time.time():
+        # CTRL+C and new work interrupt the wait, so we can respond quickly
+        if cfg.pacing.wait(cfg.sleep_until - time.time()):
+            # Only the pushed work; the next cycle stays on schedule
+            if cfg.webhook and cfg.webhook.pending():
+                handle_webhook_events(cfg)
+        return
+
+    cycle_start = time.monotonic()
+    interval = cfg.pacing.next_interval()
+    if CLEAR_THE_QUEUE_MODE:
+        logging.info("Clear the Queue Mode is engaged!")
+    else:
+        cfg.sleep_until = time.time() + interval
+
+    logging.info(
+        "Starting cycle (step %.1f/%s, next in %.0fs)",
+        cfg.archive_run_step,
+        ARCHIVING_RUN_STEPS,
+        interval,
+    )
+
+    if cfg.webhook:
+        handle_webhook_events(cfg)
+
+    # Skip every couple archiving runs for better performance
+    # The queue sync stuff is more important to run frequently
+    if cfg.archive_run_step >= ARCHIVING_RUN_STEPS:
+        logging.info("Starting archiving of old posts...")
+        if DISABLE_COMPLETED_ARCHIVING:
+            logging.info("Archiving of completed posts is disabled!")
+        elif (
+            cfg.webhook
+            and time.time() - cfg.last_sync.get("completed", 0) < WEBHOOK_SWEEP_INTERVAL_SEC
+        ):
+            logging.info("Completed posts are pushed by the webhook, skipping the sweep.")
+        else:
+            archive_completed_posts(cfg)
+            mark_synced(cfg, "completed")
+        if not DISABLE_EXPIRED_ARCHIVING:
+            archive_expired_posts(cfg)
+            mark_synced(cfg, "expired")
+        else:
+            logging.info("Archiving of expired posts is disabled!")
+
+        logging.info("Doing sync of Blossom queue...")
+        full_blossom_queue_sync(cfg)
+        mark_synced(cfg, "sync")
+
+        # Reset counter
+        cfg.archive_run_step = 0
+    else:
+        # Skip archiving step
+        pass
+    # Queue sync stuff
+    activity = 0
+    if not DISABLE_POST_REMOVAL_TRACKING:
+        activity += track_post_removal(cfg)
+        mark_synced(cfg, "removals")
+    else:
+        logging.info("Tracking of post removals is disabled!")
+    if not DISABLE_POST_REPORT_TRACKING:
+        activity += track_post_reports(cfg)
+        mark_synced(cfg, "reports")
+    else:
+        logging.info("Tracking of post reports is disabled!")
+    cfg.pacing.record_activity(activity)
+    # Send the changes the stages made to Blossom submissions
+    cfg.mutations.flush()
+
+    # Keep posting to the archive in between archiving runs, at the pace of
+    # the posting budget
+    drain_archive_queue(cfg)
+
+    # Increment run step. The steps are counted in units of the regular update
+    # delay, so that polling faster doesn't make the archiving runs (and the
+    # full queue sync with them) more frequent.
+    cfg.archive_run_step += interval / UPDATE_DELAY_SEC
+
+    metrics.inc("cycles_total")
+    metrics.set_gauge("cycle_duration_sec", time.monotonic() - cycle_start)
+    metrics.set_gauge("archive_queue_length", len(cfg.archive_queue))
+    if cfg.memory:
+        cfg.memory.record_cycle()
+    if METRICS_FILE:
+        metrics.write_metrics(METRICS_FILE)
+    maybe_save_snapshot(cfg, SNAPSHOT_FILE)
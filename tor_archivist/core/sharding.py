@@ -0,0 +1,130 @@
+"""Partitioning of the submissions between several running archivists.
+
+Every submission belongs to one of SHARD_COUNT shards, based on a stable hash
+of its Blossom ID. The instances lease shards from a shared SQLite file; a
+lease that isn't renewed within the TTL (because its instance died) is free
+to be claimed by the others.
+"""
+import logging
+import math
+import os
+import socket
+import sqlite3
+import time
+import zlib
+from typing import Any, Optional, Set
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS instances (
+    instance_id TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    shard INTEGER PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+def shard_for(submission_id: Any, shard_count: int) -> int:
+    """Return the shard that the given Blossom submission belongs to."""
+    return zlib.crc32(str(submission_id).encode()) % shard_count
+
+
+def default_instance_id() -> str:
+    """Return an ID for this process that is unique across the machines."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class ShardLeases:
+    """The shards currently leased by this instance."""
+
+    def __init__(
+        self, path: str, shard_count: int, ttl: float, instance_id: Optional[str] = None
+    ) -> None:
+        """Connect to the lease file, creating it if needed."""
+        self.shard_count = shard_count
+        self.ttl = ttl
+        self.instance_id = instance_id or default_instance_id()
+        self.owned: Set[int] = set()
+        self.renewed_at = 0.0
+
+        # Autocommit mode, the transactions are managed by hand in `renew`
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.executescript(_SCHEMA)
+
+    def renew(self, now: Optional[float] = None) -> Set[int]:
+        """Renew our leases and claim or release shards to get our fair share.
+
+        The fair share is the shard count divided by the number of live
+        instances, so when an instance joins the others hand over shards, and
+        when one dies its leases expire and get picked up.
+
+        :returns: The shards owned by this instance.
+        """
+        now = time.time() if now is None else now
+        expires_at = now + self.ttl
+
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            self.db.execute("DELETE FROM instances WHERE expires_at < ?", (now,))
+            self.db.execute("DELETE FROM leases WHERE expires_at < ?", (now,))
+            self.db.execute(
+                "INSERT OR REPLACE INTO instances (instance_id, expires_at) VALUES (?, ?)",
+                (self.instance_id, expires_at),
+            )
+            (live_instances,) = self.db.execute("SELECT COUNT(*) FROM instances").fetchone()
+            fair_share = math.ceil(self.shard_count / live_instances)
+
+            owned = [
+                shard
+                for (shard,) in self.db.execute(
+                    "SELECT shard FROM leases WHERE owner = ? ORDER BY shard", (self.instance_id,)
+                )
+            ]
+            for shard in owned[fair_share:]:
+                self.db.execute("DELETE FROM leases WHERE shard = ?", (shard,))
+            owned = owned[:fair_share]
+
+            taken = {shard for (shard,) in self.db.execute("SELECT shard FROM leases")}
+            free = [shard for shard in range(self.shard_count) if shard not in taken]
+            owned += free[: fair_share - len(owned)]
+
+            self.db.executemany(
+                "INSERT OR REPLACE INTO leases (shard, owner, expires_at) VALUES (?, ?, ?)",
+                [(shard, self.instance_id, expires_at) for shard in owned],
+            )
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+
+        if set(owned) != self.owned:
+            logging.info(
+                "Instance %s now owns shards %s of %s (%s live instances)",
+                self.instance_id,
+                sorted(owned),
+                self.shard_count,
+                live_instances,
+            )
+        self.owned = set(owned)
+        self.renewed_at = now
+        return self.owned
+
+    def owns(self, submission_id: Any) -> bool:
+        """Determine if the given submission is in one of our shards.
+
+        The leases are renewed on the way once half of the TTL has passed, so
+        that long stages don't lose them halfway through.
+        """
+        if time.time() - self.renewed_at > self.ttl / 2:
+            self.renew()
+        return shard_for(submission_id, self.shard_count) in self.owned
+
+    def release(self) -> None:
+        """Give up all our leases, e.g. when shutting down."""
+        self.db.execute("DELETE FROM leases WHERE owner = ?", (self.instance_id,))
+        self.db.execute("DELETE FROM instances WHERE instance_id = ?", (self.instance_id,))
+        self.owned = set()
+        logging.info("Instance %s released its shards.", self.instance_id)
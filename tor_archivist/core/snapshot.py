@@ -0,0 +1,96 @@
+"""Warm starts: a snapshot of what the bot knows, kept across restarts.
+
+Without it every restart runs the archiving and the full queue sync right
+away and looks up every submission on Blossom again. The snapshot holds the
+schedule, when each stage last ran, the recently seen Blossom submissions,
+the partner subreddits last seen private and the stats that order the full
+queue sync. It's a single JSON file, replaced atomically.
+"""
+import json
+import logging
+import os
+import time
+
+from tor_archivist import (
+    PRIVATE_SUBREDDIT_TTL_SEC,
+    SNAPSHOT_INTERVAL_SEC,
+    SNAPSHOT_MAX_AGE_SEC,
+    UPDATE_DELAY_SEC,
+)
+from tor_archivist.core.config import Config
+
+SNAPSHOT_VERSION = 2
+
+_last_written = 0.0
+
+
+def save_snapshot(cfg: Config, path: str) -> None:
+    """Write the snapshot of the bot's state to the given file."""
+    global _last_written
+
+    now = time.time()
+    data = {
+        "version": SNAPSHOT_VERSION,
+        "written_at": now,
+        "sleep_until": cfg.sleep_until,
+        "archive_run_step": cfg.archive_run_step,
+        "last_sync": cfg.last_sync,
+        "records": cfg.records.to_json(),
+        "sync_stats": cfg.sync_stats.to_json(),
+        "private_subreddits": {
+            name: found_at
+            for name, found_at in cfg.private_subreddits.items()
+            if now - found_at < PRIVATE_SUBREDDIT_TTL_SEC
+        },
+    }
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w") as snapshot_file:
+            json.dump(data, snapshot_file, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.warning("Could not write snapshot %s: %s", path, e)
+    _last_written = now
+
+
+def maybe_save_snapshot(cfg: Config, path: str) -> None:
+    """Write the snapshot if the last one is older than SNAPSHOT_INTERVAL_SEC."""
+    if time.time() - _last_written >= SNAPSHOT_INTERVAL_SEC:
+        save_snapshot(cfg, path)
+
+
+def load_snapshot(cfg: Config, path: str) -> bool:
+    """Restore the bot's state from the snapshot in the given file.
+
+    Snapshots older than SNAPSHOT_MAX_AGE_SEC, or from another version of the
+    format, are ignored.
+
+    :returns: Whether a snapshot was loaded.
+    """
+    try:
+        with open(path) as snapshot_file:
+            data = json.load(snapshot_file)
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError) as e:
+        logging.warning("Ignoring unreadable snapshot %s: %s", path, e)
+        return False
+
+    age = time.time() - data.get("written_at", 0)
+    if data.get("version") != SNAPSHOT_VERSION or age > SNAPSHOT_MAX_AGE_SEC:
+        logging.info("Ignoring outdated snapshot %s.", path)
+        return False
+
+    cfg.sleep_until = data["sleep_until"]
+    # The steps keep counting while the bot is down
+    cfg.archive_run_step = data["archive_run_step"] + age / UPDATE_DELAY_SEC
+    cfg.last_sync.update(data["last_sync"])
+    cfg.records.load_json(data["records"])
+    cfg.sync_stats.load_json(data["sync_stats"])
+    cfg.private_subreddits.update(data["private_subreddits"])
+    logging.info(
+        "Warm start from snapshot written %.0fs ago (%s known submissions).",
+        age,
+        len(cfg.records),
+    )
+    return True
@@ -0,0 +1,110 @@
+"""Risk-based ordering of the submissions in the full queue sync.
+
+Most submissions in the queue are fine, and checking them one by one takes
+a while. To catch removals and NSFW flags early in each pass, the sync
+checks the riskiest submissions first. The risk is scored from what earlier
+passes saw:
+
+- how often posts of the partner subreddit turned out to be removed
+- how old the post is
+- whether the post has a pending report in the mod queue
+- what happened the last time the post was checked
+"""
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set
+
+from tor_archivist.core.records import BlossomSubmission
+
+REMOVAL_RATE_WEIGHT = 2.0
+AGE_WEIGHT = 1.0
+PENDING_REPORT_WEIGHT = 3.0
+# Posts that needed action last time are likely to need it again; posts
+# that were fine are less of a risk than ones we know nothing about
+CHANGED_BEFORE_WEIGHT = 1.0
+OK_BEFORE_WEIGHT = -0.5
+# Once a subreddit has this many checks, its counts are halved, so that the
+# rate follows recent behavior
+MAX_CHECKS_PER_SUBREDDIT = 1000
+
+
+class SyncStats:
+    """What the full queue sync learned about the submissions it checked."""
+
+    def __init__(self, max_outcomes: int) -> None:
+        """Create stats that know nothing yet."""
+        self.max_outcomes = max_outcomes
+        # subreddit -> [checked, removed]
+        self.subreddits: Dict[str, List[float]] = {}
+        # ToR URL -> outcome of the last check, "ok" or "changed"
+        self.outcomes: "OrderedDict[str, str]" = OrderedDict()
+        # ToR URLs of the posts with reports in the mod queue
+        self.pending_reports: Set[str] = set()
+
+    def removal_rate(self, subreddit: Optional[str]) -> float:
+        """Return the share of checked posts of the subreddit that were removed.
+
+        Smoothed, so that subreddits with few checks start out at one half.
+        """
+        checked, removed = self.subreddits.get(subreddit or "", (0, 0))
+        return (removed + 1) / (checked + 2)
+
+    def score(self, b_submission: BlossomSubmission, now: datetime, max_age: float) -> float:
+        """Return how likely the submission is to need an update.
+
+        :param max_age: The age in seconds at which posts leave the queue.
+        """
+        score = REMOVAL_RATE_WEIGHT * self.removal_rate(b_submission.subreddit)
+
+        created = b_submission.created_at
+        if created is not None:
+            age = (now - created).total_seconds()
+            score += AGE_WEIGHT * min(1.0, max(0.0, age / max_age))
+
+        if b_submission.tor_url in self.pending_reports:
+            score += PENDING_REPORT_WEIGHT
+
+        outcome = self.outcomes.get(b_submission.tor_url)
+        if outcome == "changed":
+            score += CHANGED_BEFORE_WEIGHT
+        elif outcome == "ok":
+            score += OK_BEFORE_WEIGHT
+        return score
+
+    def prioritize(
+        self, b_submissions: Iterable[BlossomSubmission], max_age: float
+    ) -> List[BlossomSubmission]:
+        """Return the submissions ordered from the highest risk to the lowest."""
+        now = datetime.now(tz=timezone.utc)
+        return sorted(b_submissions, key=lambda b: self.score(b, now, max_age), reverse=True)
+
+    def record(self, b_submission: BlossomSubmission, changed: bool) -> None:
+        """Record the outcome of checking the submission."""
+        subreddit = b_submission.subreddit
+        if subreddit is not None:
+            counts = self.subreddits.setdefault(subreddit, [0, 0])
+            counts[0] += 1
+            counts[1] += int(changed)
+            if counts[0] >= MAX_CHECKS_PER_SUBREDDIT:
+                counts[0] /= 2
+                counts[1] /= 2
+
+        self.outcomes[b_submission.tor_url] = "changed" if changed else "ok"
+        self.outcomes.move_to_end(b_submission.tor_url)
+        while len(self.outcomes) > self.max_outcomes:
+            self.outcomes.popitem(last=False)
+
+    def to_json(self) -> Dict:
+        """Return the stats as JSON-serializable data, for `load_json`."""
+        return {
+            "subreddits": self.subreddits,
+            "outcomes": list(self.outcomes.items()),
+            "pending_reports": sorted(self.pending_reports),
+        }
+
+    def load_json(self, data: Dict) -> None:
+        """Restore the stats returned by `to_json`."""
+        self.subreddits.update(data["subreddits"])
+        for tor_url, outcome in data["outcomes"]:
+            self.outcomes[tor_url] = outcome
+        self.pending_reports.update(data["pending_reports"])
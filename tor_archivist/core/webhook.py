@@ -0,0 +1,189 @@
+"""An optional receiver for events pushed by Blossom.
+
+Without it, a completed transcription waits for the next archiving run
+before it's archived. With WEBHOOK_PORT set, Blossom (or anything standing
+in for it) can tell the bot about a submission right away:
+
+    POST /events
+    X-Webhook-Token: <WEBHOOK_TOKEN, if set>
+
+    {"event": "completed", "submission_id": 123}
+    {"event": "reported", "submission": {<Blossom submission>}, "reason": "Rule 3"}
+
+The event types are "completed", "expired" and "reported". The events are
+queued and the main loop is woken up to handle them; the receiver itself
+never talks to Blossom or Reddit. The events are only hints: the main loop
+fetches every submission from Blossom again and ignores the events that
+don't match its state there, e.g. an "expired" event for a fresh post. The
+periodic sweeps still run, less often, to catch whatever events got lost.
+"""
+import hmac
+import json
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, NamedTuple, Optional
+
+from tor_archivist.core.records import BlossomSubmission
+
+EVENT_TYPES = ("completed", "expired", "reported")
+# Repeated events for the same submission within this time are dropped
+DUPLICATE_WINDOW_SEC = 10 * 60
+MAX_BODY_BYTES = 64 * 1024
+
+
+class WebhookEvent(NamedTuple):
+    """An event about a single submission."""
+
+    kind: str
+    submission_id: int
+    # Included if the sender sent the whole submission; only the ID is used
+    submission: Optional[BlossomSubmission]
+    reason: Optional[str]
+
+
+def parse_event(data: Any) -> WebhookEvent:
+    """Create an event from the JSON body of a request.
+
+    :raises ValueError: If the body isn't a valid event.
+    """
+    if not isinstance(data, dict) or data.get("event") not in EVENT_TYPES:
+        raise ValueError(f"The event must be one of {', '.join(EVENT_TYPES)}")
+
+    submission = None
+    if isinstance(data.get("submission"), dict):
+        try:
+            submission = BlossomSubmission.from_json(data["submission"])
+        except KeyError as e:
+            raise ValueError(f"The submission is missing {e}")
+        submission_id = submission.id
+    elif isinstance(data.get("submission_id"), int):
+        submission_id = data["submission_id"]
+    else:
+        raise ValueError("Either submission or submission_id is required")
+
+    return WebhookEvent(data["event"], submission_id, submission, data.get("reason"))
+
+
+class WebhookReceiver(ThreadingHTTPServer):
+    """Accepts events over HTTP and queues them for the main loop.
+
+    :param on_event: Called after an event was queued, to wake up the loop.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        token: Optional[str],
+        queue_size: int,
+        on_event: Callable[[], None],
+    ) -> None:
+        """Bind the receiver to the given address."""
+        super().__init__((host, port), WebhookHandler)
+        self.token = token
+        self.on_event = on_event
+        self.events: "queue.Queue[WebhookEvent]" = queue.Queue(maxsize=queue_size)
+        # (event type, submission ID) -> when it was last queued
+        self.recent: "OrderedDict[Any, float]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(
+            target=self.serve_forever, kwargs={"poll_interval": 0.1}, daemon=True
+        )
+
+    def start(self) -> None:
+        """Start accepting events in the background."""
+        self.thread.start()
+        logging.info("Webhook receiver listening on %s:%s", *self.server_address[:2])
+
+    def stop(self) -> None:
+        """Stop accepting events."""
+        self.shutdown()
+        self.server_close()
+
+    def put(self, event: WebhookEvent) -> bool:
+        """Queue the event, unless it's a duplicate.
+
+        :raises queue.Full: If there are too many events waiting already.
+        :returns: Whether the event was queued.
+        """
+        key = (event.kind, event.submission_id)
+        now = time.monotonic()
+        with self.lock:
+            while self.recent and now - next(iter(self.recent.values())) >= DUPLICATE_WINDOW_SEC:
+                self.recent.popitem(last=False)
+            if key in self.recent:
+                return False
+            self.events.put_nowait(event)
+            self.recent[key] = now
+        self.on_event()
+        return True
+
+    def pending(self) -> bool:
+        """Determine if there are events waiting to be handled."""
+        return not self.events.empty()
+
+    def next_event(self) -> Optional[WebhookEvent]:
+        """Return the next event waiting to be handled, if there is one."""
+        try:
+            return self.events.get_nowait()
+        except queue.Empty:
+            return None
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """Handles the requests to the webhook receiver."""
+
+    server: WebhookReceiver
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Log the requests through our own logging, not to stderr."""
+        logging.debug("Webhook: " + format, *args)
+
+    def _respond(self, status: int, detail: str) -> None:
+        content = json.dumps({"detail": detail}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_POST(self) -> None:
+        """Queue the event in the body of the request."""
+        if self.path.rstrip("/") != "/events":
+            self._respond(404, "Not found.")
+            return
+        token = self.server.token
+        sent_token = self.headers.get("X-Webhook-Token", "").encode()
+        if token and not hmac.compare_digest(sent_token, token.encode()):
+            self._respond(401, "Invalid token.")
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._respond(400, "Invalid Content-Length.")
+            return
+        if length > MAX_BODY_BYTES:
+            self._respond(413, "Event too large.")
+            return
+        try:
+            event = parse_event(json.loads(self.rfile.read(length)))
+        except ValueError as e:
+            self._respond(400, str(e))
+            return
+
+        try:
+            queued = self.server.put(event)
+        except queue.Full:
+            logging.warning("Webhook queue is full, dropping %s event.", event.kind)
+            self._respond(503, "Too many events waiting.")
+            return
+        self._respond(202, "Queued." if queued else "Already queued.")
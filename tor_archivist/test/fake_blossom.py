@@ -0,0 +1,138 @@
+"""A local stand-in for the Blossom API, for tests that need real HTTP."""
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+class FakeBlossomServer(ThreadingHTTPServer):
+    """Serves JSON bodies by path and records the requests it gets.
+
+    :param validators: Which cache validators to send along: "etag",
+        "last-modified", both or none.
+    :param bulk: Whether to answer the `submission/bulk/<action>` endpoints.
+    """
+
+    def __init__(
+        self, validators: Tuple[str, ...] = ("etag", "last-modified"), bulk: bool = True
+    ) -> None:
+        """Bind the server to a free local port."""
+        super().__init__(("127.0.0.1", 0), FakeBlossomHandler)
+        self.validators = validators
+        self.bulk = bulk
+        # Submission IDs that PATCH requests answer with 404 for
+        self.missing_ids: Set[int] = set()
+        # Sent instead of the statuses by the bulk endpoints, if set
+        self.bulk_body: Optional[Any] = None
+        # Status code the bulk endpoints answer with
+        self.bulk_status = 200
+        self.patches: List[Tuple[str, Any]] = []
+        self.bodies: Dict[str, Any] = {}
+        self.last_modified: Dict[str, str] = {}
+        self.requests: List[Tuple[str, str, Dict[str, str]]] = []
+        self.full_responses = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(
+            target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        """The base URL of the API, as passed to the Blossom wrapper."""
+        return f"http://127.0.0.1:{self.server_address[1]}/api/"
+
+    def set_body(self, path: str, body: Any, last_modified: Optional[str] = None) -> None:
+        """Serve the given body on GET requests to the path."""
+        self.bodies[path] = body
+        self.last_modified[path] = last_modified or "Tue, 01 Jun 2021 12:00:00 GMT"
+
+    def __enter__(self) -> "FakeBlossomServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class FakeBlossomHandler(BaseHTTPRequestHandler):
+    server: FakeBlossomServer
+
+    def log_message(self, *args: Any) -> None:
+        """Keep the test output clean."""
+        pass
+
+    def _record(self) -> str:
+        path = self.path.split("?")[0][len("/api/") :]
+        with self.server.lock:
+            self.server.requests.append((self.command, path, dict(self.headers)))
+        return path
+
+    def _send_json(self, status: int, body: Any, headers: Dict[str, str]) -> None:
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self) -> None:
+        """Serve the body of the path, honoring the cache validators."""
+        path = self._record()
+        if path not in self.server.bodies:
+            self._send_json(404, {"detail": "Not found."}, {})
+            return
+
+        body = self.server.bodies[path]
+        etag = '"' + hashlib.md5(json.dumps(body).encode()).hexdigest() + '"'
+        last_modified = self.server.last_modified[path]
+        headers = {}
+        if "etag" in self.server.validators:
+            headers["ETag"] = etag
+        if "last-modified" in self.server.validators:
+            headers["Last-Modified"] = last_modified
+
+        if "etag" in self.server.validators:
+            not_modified = self.headers["If-None-Match"] == etag
+        else:
+            not_modified = (
+                "last-modified" in self.server.validators
+                and self.headers["If-Modified-Since"] == last_modified
+            )
+        if not_modified:
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+
+        with self.server.lock:
+            self.server.full_responses += 1
+        self._send_json(200, body, headers)
+
+    def do_PATCH(self) -> None:
+        """Apply an action to one submission, or to several in bulk."""
+        path = self._record()
+        length = int(self.headers["Content-Length"] or 0)
+        data = json.loads(self.rfile.read(length)) if length else None
+        with self.server.lock:
+            self.server.patches.append((path, data))
+
+        parts = path.strip("/").split("/")
+        if parts[1] == "bulk":
+            if not self.server.bulk:
+                self._send_json(404, {"detail": "Not found."}, {})
+                return
+            statuses = {
+                str(b_id): 404 if b_id in self.server.missing_ids else 200 for b_id in data["ids"]
+            }
+            if self.server.bulk_body is not None:
+                statuses = self.server.bulk_body
+            self._send_json(self.server.bulk_status, statuses, {})
+        elif int(parts[1]) in self.server.missing_ids:
+            self._send_json(404, {"detail": "Not found."}, {})
+        else:
+            self._send_json(200, {}, {})
@@ -0,0 +1,126 @@
+from pathlib import Path
+from typing import List, Tuple
+
+import pytest
+from praw.exceptions import RedditAPIException
+
+from tor_archivist.core.archive_queue import CLAIM_TTL_SEC, ArchiveQueue
+from tor_archivist.core.helpers import get_rate_limit_delay
+
+
+class FakeArchive:
+    def __init__(self, rate_limited: int = 0) -> None:
+        self.posts: List[Tuple[str, str]] = []
+        self.rate_limited = rate_limited
+
+    def submit(self, title: str, url: str) -> None:
+        if self.rate_limited:
+            self.rate_limited -= 1
+            raise RedditAPIException(
+                [["RATELIMIT", "Take a break for 2 minutes before trying again.", None]]
+            )
+        self.posts.append((title, url))
+
+
+def _fill(queue: ArchiveQueue, count: int) -> None:
+    for i in range(count):
+        queue.put(i, f"Post {i}", f"https://reddit.com/r/x/comments/{i}/")
+
+
+def test_get_rate_limit_delay() -> None:
+    assert get_rate_limit_delay("you are doing that too much. try again in 5 minutes.") == 300
+    assert get_rate_limit_delay("Take a break for 1 second before trying again.") == 1
+    assert get_rate_limit_delay("Something else went wrong") is None
+
+
+def test_drain_is_paced_by_budget(tmp_path: Path) -> None:
+    queue = ArchiveQueue(str(tmp_path / "queue.sqlite3"), 3600, burst=3, max_attempts=5)
+    archive = FakeArchive()
+    _fill(queue, 5)
+    # Queueing a post twice doesn't post it twice
+    queue.put(0, "Post 0", "https://reddit.com/r/x/comments/0/")
+
+    assert queue.drain(archive.submit, now=1000) == 3
+    assert queue.drain(archive.submit, now=1000) == 0
+    # One token per second
+    assert queue.drain(archive.submit, now=1002) == 2
+    assert [title for title, _ in archive.posts] == [f"Post {i}" for i in range(5)]
+    assert len(queue) == 0
+
+
+def test_drain_resumes_after_rate_limit(tmp_path: Path) -> None:
+    path = str(tmp_path / "queue.sqlite3")
+    queue = ArchiveQueue(path, 3600, burst=10, max_attempts=5)
+    archive = FakeArchive(rate_limited=1)
+    _fill(queue, 3)
+
+    assert queue.drain(archive.submit, now=1000) == 0
+    assert queue.drain(archive.submit, now=1060) == 0
+
+    # The queue and the wait survive a restart
+    queue = ArchiveQueue(path, 3600, burst=10, max_attempts=5)
+    assert len(queue) == 3
+    assert queue.drain(archive.submit, now=1121) == 3
+    assert [title for title, _ in archive.posts] == ["Post 0", "Post 1", "Post 2"]
+
+
+def test_drain_gives_up_on_broken_posts(tmp_path: Path) -> None:
+    queue = ArchiveQueue(str(tmp_path / "queue.sqlite3"), 3600, burst=10, max_attempts=2)
+    _fill(queue, 1)
+
+    def broken(title: str, url: str) -> None:
+        raise ValueError("nope")
+
+    queue.drain(broken, now=0)
+    assert len(queue) == 1
+    queue.drain(broken, now=1)
+    assert len(queue) == 0
+
+
+def test_other_api_errors_count_as_failed_attempts(tmp_path: Path) -> None:
+    queue = ArchiveQueue(str(tmp_path / "queue.sqlite3"), 3600, burst=10, max_attempts=2)
+    _fill(queue, 2)
+    posted = []
+
+    def first_not_allowed(title: str, url: str) -> None:
+        if title == "Post 0":
+            raise RedditAPIException([["SUBREDDIT_NOTALLOWED", "not allowed", None]])
+        posted.append(title)
+
+    assert queue.drain(first_not_allowed, now=0) == 1
+    assert posted == ["Post 1"]
+    assert len(queue) == 1
+
+    # Given up on after the second attempt instead of blocking the queue
+    assert queue.drain(first_not_allowed, now=1) == 0
+    assert len(queue) == 0
+
+
+def test_processes_sharing_the_queue_do_not_post_twice(tmp_path: Path) -> None:
+    path = str(tmp_path / "queue.sqlite3")
+    daemon = ArchiveQueue(path, 3600, burst=10, max_attempts=5)
+    cron_job = ArchiveQueue(path, 3600, burst=10, max_attempts=5)
+    _fill(daemon, 3)
+    posted = []
+
+    def submit(title: str, url: str) -> None:
+        posted.append(title)
+        if len(posted) == 1:
+            # The other process drains while the first post is being submitted
+            cron_job.drain(lambda title, url: posted.append(title), now=0)
+
+    daemon.drain(submit, now=0)
+
+    assert sorted(posted) == ["Post 0", "Post 1", "Post 2"]
+    assert len(daemon) == 0
+
+
+def test_claims_of_dead_processes_expire(tmp_path: Path) -> None:
+    queue = ArchiveQueue(str(tmp_path / "queue.sqlite3"), 3600, burst=10, max_attempts=5)
+    archive = FakeArchive()
+    _fill(queue, 1)
+    # Claimed by a process that died before submitting it
+    queue._claim_next(0, set())
+
+    assert queue.drain(archive.submit, now=1) == 0
+    assert queue.drain(archive.submit, now=CLAIM_TTL_SEC) == 1
@@ -0,0 +1,153 @@
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Set
+
+import pytest
+
+from tor_archivist.core import clear_the_queue as ctq
+from tor_archivist.core import helpers
+from tor_archivist.core.pacing import PacingController
+
+
+class FakeResponse:
+    def __init__(self, data: Any, status_code: int = 200) -> None:
+        self.content = json.dumps(data).encode()
+        self.status_code = status_code
+        self.ok = status_code < 400
+
+
+class FakeBlossom:
+    """An expired endpoint where archived submissions disappear."""
+
+    def __init__(self, count: int) -> None:
+        self.expired = [
+            {"id": i, "tor_url": f"https://reddit.com/r/TranscribersOfReddit/comments/a{i}/x/"}
+            for i in range(count)
+        ]
+        self.archived: List[int] = []
+        # Submission IDs that can't be archived
+        self.broken: Set[int] = set()
+        self.lock = threading.Lock()
+
+    def get(self, path: str, params: Dict) -> FakeResponse:
+        assert path == "submission/expired/"
+        assert params["ctq"]
+        size, page = params["page_size"], params["page"]
+        results = self.expired[(page - 1) * size : page * size]
+        has_next = page * size < len(self.expired)
+        return FakeResponse(
+            {"count": len(self.expired), "next": has_next or None, "results": results}
+        )
+
+    def archive_submission(self, submission_id: int) -> FakeResponse:
+        if submission_id in self.broken:
+            return FakeResponse({"detail": "Server error."}, status_code=500)
+        with self.lock:
+            self.archived.append(submission_id)
+            self.expired = [b for b in self.expired if b["id"] != submission_id]
+        return FakeResponse({})
+
+
+class FakeMod:
+    def __init__(self, post: "FakePost") -> None:
+        self.post = post
+
+    def remove(self) -> None:
+        self.post.removed_by_category = "moderator"
+
+
+class FakePost:
+    def __init__(self, post_id: str) -> None:
+        self.id = post_id
+        self.removed_by_category = None
+        self.mod = FakeMod(self)
+
+
+class FakeAuth:
+    def __init__(self) -> None:
+        self.limits: Dict[str, Any] = {"remaining": 500, "reset_timestamp": None}
+
+
+class FakeReddit:
+    def __init__(self) -> None:
+        self.auth = FakeAuth()
+        self.info_calls = 0
+
+    def info(self, fullnames: List[str]) -> List[FakePost]:
+        assert len(fullnames) <= ctq.HYDRATE_BATCH_SIZE
+        self.info_calls += 1
+        return [FakePost(fullname[3:]) for fullname in fullnames]
+
+
+class FakeConfig:
+    shards = None
+
+    def __init__(self, count: int) -> None:
+        self.blossom = FakeBlossom(count)
+        self.reddit = FakeReddit()
+        self.pacing = PacingController(1, 60, 1, 60)
+
+
+def test_clear_the_queue_archives_everything(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(ctq, "CTQ_PAGE_SIZE", 150)
+    cfg = FakeConfig(400)
+
+    ctq.clear_the_queue(cfg)
+
+    assert sorted(cfg.blossom.archived) == list(range(400))
+    # The posts are loaded from Reddit in batches, not one by one
+    assert cfg.reddit.info_calls < 10
+
+
+def test_failed_archiving_is_logged(caplog: pytest.LogCaptureFixture) -> None:
+    cfg = FakeConfig(3)
+    cfg.blossom.broken = {1}
+
+    ctq.clear_the_queue(cfg)
+
+    assert sorted(cfg.blossom.archived) == [0, 2]
+    errors = [r.getMessage() for r in caplog.records if r.levelno == logging.ERROR]
+    assert len(errors) == 1
+    assert "Failed to archive submission 1" in errors[0]
+
+
+def test_clear_the_queue_stops_when_shutting_down(monkeypatch: pytest.MonkeyPatch) -> None:
+    cfg = FakeConfig(10)
+    cfg.reddit.auth.limits = {"remaining": 0, "reset_timestamp": time.time() + 3600}
+    # As if CTRL+C was pressed
+    monkeypatch.setattr(helpers, "running", False)
+    cfg.pacing.wake()
+
+    start = time.monotonic()
+    ctq.clear_the_queue(cfg)
+
+    assert time.monotonic() - start < 5
+    assert cfg.reddit.info_calls == 0
+    assert cfg.blossom.archived == []
+
+
+def test_new_work_does_not_cut_the_rate_limit_wait_short() -> None:
+    cfg = FakeConfig(1)
+    cfg.reddit.auth.limits = {"remaining": 0, "reset_timestamp": time.time() + 0.3}
+    # As if a webhook event came in
+    cfg.pacing.wake()
+
+    start = time.monotonic()
+    ctq.clear_the_queue(cfg)
+
+    assert time.monotonic() - start >= 0.25
+    assert cfg.blossom.archived == [0]
+    # The main loop still gets to see the event
+    assert cfg.pacing.wait(0)
+
+
+def test_progress_eta() -> None:
+    progress = ctq.Progress(interval=3600)
+    assert progress.eta() is None
+
+    progress.total = 100
+    progress.started_at -= 10
+    progress.tick(25)
+    assert progress.eta() == pytest.approx(30, rel=0.1)
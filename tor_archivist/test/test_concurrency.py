@@ -0,0 +1,109 @@
+import threading
+import time
+from typing import Any, List
+
+import pytest
+from requests import Session
+
+from tor_archivist.core import metrics
+from tor_archivist.core.concurrency import AdaptiveLimiter
+from tor_archivist.core.http_cache import CachingAdapter
+from tor_archivist.test.fake_blossom import FakeBlossomServer
+
+
+class Response:
+    def __init__(self, status_code: int) -> None:
+        self.status_code = status_code
+
+
+def _limiter(**kwargs: Any) -> AdaptiveLimiter:
+    options = {"initial": 2, "min_limit": 0.25, "max_limit": 8, "latency_target": 1}
+    options.update(kwargs)
+    return AdaptiveLimiter("Blossom", **options)
+
+
+def test_limit_grows_additively() -> None:
+    limiter = _limiter()
+    for _ in range(2):
+        limiter.run(lambda: Response(200))
+    assert limiter.limit == pytest.approx(2 + 1 / 2 + 1 / 2.5)
+    for _ in range(100):
+        limiter.run(lambda: Response(200))
+    assert limiter.limit == 8
+    assert metrics.get_metrics()["concurrency_limit_blossom"] == 8
+
+
+@pytest.mark.parametrize("status, reason", [(429, "429"), (503, "5xx")])
+def test_overload_halves_the_limit_once_per_round_trip(status: int, reason: str) -> None:
+    limiter = _limiter(initial=8)
+    limiter.latency = 60
+    before = metrics.get_metrics().get(f"concurrency_decreases_blossom_{reason}", 0)
+
+    for _ in range(3):
+        limiter.run(lambda: Response(status))
+
+    assert limiter.limit == 4
+    assert metrics.get_metrics()[f"concurrency_decreases_blossom_{reason}"] == before + 3
+
+
+def test_slow_requests_and_errors_count_as_overload() -> None:
+    limiter = _limiter(initial=8, latency_target=0)
+    limiter.run(lambda: Response(200))
+    assert limiter.limit == 4
+
+    def broken() -> None:
+        raise ConnectionError("Blossom is down")
+
+    limiter.latency_target = 60
+    limiter.last_decrease = 0
+    with pytest.raises(ConnectionError):
+        limiter.run(broken)
+    assert limiter.limit == 2
+
+
+def test_limit_bounds_the_requests_in_flight() -> None:
+    limiter = _limiter(initial=3, latency_target=60)
+    in_flight: List[int] = []
+    lock = threading.Lock()
+    running = [0]
+
+    def request() -> Response:
+        with lock:
+            running[0] += 1
+            in_flight.append(running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return Response(200)
+
+    threads = [threading.Thread(target=limiter.run, args=(request,)) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(in_flight) <= 8
+    assert max(in_flight[:4]) <= 3
+
+
+def test_limit_below_one_spaces_requests_out() -> None:
+    limiter = _limiter(initial=0.25, latency_target=60)
+    limiter.latency = 0.02
+    starts: List[float] = []
+    for _ in range(2):
+        limiter.run(lambda: starts.append(time.monotonic()))
+    # Idle for about two round trips at 0.35
+    assert starts[1] - starts[0] >= 0.02
+
+
+def test_blossom_requests_go_through_the_limiter() -> None:
+    with FakeBlossomServer() as server:
+        limiter = _limiter()
+        session = Session()
+        session.mount("http://", CachingAdapter(max_entries=10, limiter=limiter))
+
+        session.get(server.url + "submission/")
+        session.patch(server.url + "submission/1/remove")
+
+        assert limiter.in_flight == 0
+        assert limiter.limit == pytest.approx(2 + 1 / 2 + 1 / 2.5)
@@ -0,0 +1,128 @@
+from typing import Any, Dict, List, Tuple
+
+import pytest
+from requests import Session
+
+from tor_archivist.core import http_cache, queue_sync
+from tor_archivist.core.config import Config
+from tor_archivist.core.http_cache import CachingAdapter, should_skip
+from tor_archivist.core.records import SubmissionPage
+from tor_archivist.test.fake_blossom import FakeBlossomServer
+
+PAGE = {
+    "count": 1,
+    "next": None,
+    "results": [{"id": 1, "tor_url": "https://reddit.com/r/TranscribersOfReddit/comments/a/"}],
+}
+
+
+def _session() -> Tuple[Session, CachingAdapter]:
+    session = Session()
+    adapter = CachingAdapter(max_entries=10)
+    session.mount("http://", adapter)
+    return session, adapter
+
+
+@pytest.mark.parametrize("validators", [("etag",), ("last-modified",)])
+def test_conditional_requests(validators: Tuple[str, ...]) -> None:
+    with FakeBlossomServer(validators) as server:
+        server.set_body("submission/unarchived/", PAGE)
+        session, _ = _session()
+        url = server.url + "submission/unarchived/"
+
+        first = session.get(url)
+        assert not first.unchanged
+        assert not should_skip(first)
+
+        second = session.get(url)
+        assert second.status_code == 200
+        assert second.unchanged
+        assert should_skip(second)
+        assert SubmissionPage.from_response(second).results[0].id == 1
+        # The second time around the server didn't have to send the body
+        assert server.full_responses == 1
+        headers = server.requests[-1][2]
+        assert "If-None-Match" in headers or "If-Modified-Since" in headers
+
+        server.set_body(
+            "submission/unarchived/", dict(PAGE, count=2), "Wed, 02 Jun 2021 12:00:00 GMT"
+        )
+        third = session.get(url)
+        assert not third.unchanged
+        assert server.full_responses == 2
+
+
+def test_content_hash_fallback() -> None:
+    with FakeBlossomServer(validators=()) as server:
+        server.set_body("submission/expired/", PAGE)
+        session, _ = _session()
+        url = server.url + "submission/expired/"
+
+        assert not session.get(url).unchanged
+        response = session.get(url)
+        assert response.unchanged
+        assert "If-None-Match" not in server.requests[-1][2]
+        assert should_skip(response)
+
+
+def test_unchanged_content_is_processed_again_eventually(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    with FakeBlossomServer() as server:
+        server.set_body("submission/expired/", PAGE)
+        session, _ = _session()
+        url = server.url + "submission/expired/"
+        session.get(url)
+
+        monkeypatch.setattr(http_cache, "HTTP_CACHE_MAX_SKIP_SEC", 0)
+        assert not should_skip(session.get(url))
+
+
+def test_cache_is_bounded() -> None:
+    with FakeBlossomServer() as server:
+        session, adapter = _session()
+        for i in range(15):
+            server.set_body(f"submission/{i}/", PAGE)
+            session.get(server.url + f"submission/{i}/")
+
+        assert len(adapter.entries) == 10
+
+
+class CachedBlossom:
+    """The parts of the Blossom wrapper the full queue sync uses."""
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.http, _ = _session()
+
+    def get(self, path: str, params: Dict) -> Any:
+        return self.http.get(self.url + path)
+
+
+class FakeReddit:
+    def __init__(self) -> None:
+        self.synced: List[str] = []
+
+    def submission(self, url: str) -> str:
+        self.synced.append(url)
+        return url
+
+
+def test_full_sync_checks_unchanged_pages(monkeypatch: pytest.MonkeyPatch) -> None:
+    with FakeBlossomServer() as server:
+        server.set_body("submission/", PAGE)
+        cfg = Config()
+        cfg.blossom = CachedBlossom(server.url)
+        cfg.reddit = FakeReddit()
+        monkeypatch.setattr(
+            queue_sync,
+            "_auto_report_handling",
+            lambda *args: queue_sync.ReportHandling(False, False),
+        )
+
+        queue_sync.full_blossom_queue_sync(cfg)
+        queue_sync.full_blossom_queue_sync(cfg)
+
+        assert server.full_responses == 1
+        # The posts on Reddit can change even if the page didn't
+        assert cfg.reddit.synced == [PAGE["results"][0]["tor_url"]] * 2
@@ -0,0 +1,106 @@
+import logging
+import queue
+import sys
+from typing import Iterator, List
+
+import pytest
+
+from tor_archivist.core.log_pipeline import (
+    CollapsingHandler,
+    NonBlockingQueueHandler,
+    start_log_pipeline,
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.messages: List[str] = []
+        self.records: List[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(record.getMessage())
+        self.records.append(record)
+
+
+@pytest.fixture
+def root_logger() -> Iterator[logging.Logger]:
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+    root.handlers = handlers
+    root.setLevel(level)
+
+
+def _warn_missing(tor_url: str) -> None:
+    logging.warning("Can't find submission %s in Blossom!", tor_url)
+
+
+def test_pipeline_collapses_repeated_warnings(root_logger: logging.Logger) -> None:
+    target = ListHandler()
+    root_logger.setLevel(logging.INFO)
+    listener = start_log_pipeline([target], queue_size=100, collapse_window=60)
+
+    logging.info("Starting cycle")
+    for i in range(5):
+        _warn_missing(f"https://reddit.com/{i}")
+    logging.info("Done")
+    listener.stop()
+
+    assert target.messages == [
+        "Starting cycle",
+        "Can't find submission https://reddit.com/0 in Blossom!",
+        "Done",
+        "Can't find submission https://reddit.com/4 in Blossom! (repeated 4 more times)",
+    ]
+
+
+def test_collapsed_window_is_reported_when_over() -> None:
+    target = ListHandler()
+    collapser = CollapsingHandler([target], window=0)
+    record = logging.makeLogRecord(
+        {"levelno": logging.WARNING, "msg": "Oh no %s", "args": (1,), "lineno": 3}
+    )
+
+    collapser.handle(record)
+    collapser.flush_summaries(0, force=True)
+    collapser.handle(record)
+
+    assert target.messages == ["Oh no 1", "Oh no 1"]
+
+
+def test_errors_are_not_collapsed() -> None:
+    target = ListHandler()
+    collapser = CollapsingHandler([target], window=60)
+    for i in range(3):
+        try:
+            raise ValueError(i)
+        except ValueError:
+            record = logging.makeLogRecord(
+                {
+                    "levelno": logging.ERROR,
+                    "msg": "Stage %s failed!",
+                    "args": ("sync",),
+                    "exc_info": sys.exc_info(),
+                }
+            )
+        collapser.handle(record)
+
+    assert target.messages == ["Stage sync failed!"] * 3
+    assert target.records[-1].exc_info is not None
+
+
+def test_full_queue_drops_instead_of_blocking() -> None:
+    log_queue: queue.Queue = queue.Queue(maxsize=1)
+    handler = NonBlockingQueueHandler(log_queue)
+    record = logging.makeLogRecord({"msg": "hello"})
+
+    handler.handle(record)
+    handler.handle(record)
+    handler.handle(record)
+    assert handler.dropped == 2
+
+    log_queue.get_nowait()
+    handler.handle(record)
+    assert log_queue.get_nowait().getMessage() == "Log queue was full, dropped 2 records!"
+    assert handler.dropped == 1
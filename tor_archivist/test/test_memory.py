@@ -0,0 +1,111 @@
+import json
+import tracemalloc
+from typing import Any, Dict, Iterator, List
+
+import pytest
+
+from tor_archivist import MEMORY_GROWTH_LIMIT_BYTES
+from tor_archivist.core import metrics, queue_sync
+from tor_archivist.core.config import Config
+from tor_archivist.core.memory import (
+    GROWTH_WINDOW,
+    MemoryGrowthError,
+    MemoryMonitor,
+    check_memory_growth,
+    growth_per_cycle,
+)
+
+WARMUP_CYCLES = 5
+MEASURED_CYCLES = 20
+
+
+class FakeResponse:
+    ok = True
+
+    def __init__(self, data: Any) -> None:
+        self.content = json.dumps(data).encode()
+
+
+class FakeBlossom:
+    def get(self, path: str, params: Dict) -> FakeResponse:
+        results = [
+            {
+                "id": i,
+                "url": f"https://reddit.com/r/me_irl/comments/p{i}/",
+                "tor_url": f"https://reddit.com/r/TranscribersOfReddit/comments/t{i}/",
+                "nsfw": False,
+                "removed_from_queue": False,
+            }
+            for i in range(100)
+        ]
+        return FakeResponse({"count": 100, "next": None, "results": results})
+
+
+class FakePost:
+    over_18 = False
+    removed_by_category = None
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+
+
+class FakeReddit:
+    def submission(self, url: str) -> FakePost:
+        return FakePost(url)
+
+
+class FakeConfig(Config):
+    shards = None
+    blossom = FakeBlossom()
+    reddit = FakeReddit()
+
+
+@pytest.fixture(autouse=True)
+def stop_tracing() -> Iterator[None]:
+    yield
+    tracemalloc.stop()
+
+
+def _run_cycles(monitor: MemoryMonitor, cycle: Any) -> List[int]:
+    for _ in range(WARMUP_CYCLES):
+        cycle()
+    for _ in range(MEASURED_CYCLES):
+        cycle()
+        monitor.record_cycle()
+    return list(monitor.samples)[-MEASURED_CYCLES:]
+
+
+def test_growth_per_cycle() -> None:
+    assert growth_per_cycle([]) == 0
+    assert growth_per_cycle([100, 200, 300, 400]) == pytest.approx(100)
+    assert growth_per_cycle([100, 100, 100]) == pytest.approx(0)
+
+
+def test_monitor_keeps_a_bounded_number_of_samples() -> None:
+    monitor = MemoryMonitor(snapshot_every=1000)
+    for _ in range(GROWTH_WINDOW * 2):
+        monitor.record_cycle()
+
+    assert len(monitor.samples) == GROWTH_WINDOW
+
+
+def test_full_queue_sync_does_not_leak() -> None:
+    """The benchmark: repeated full queue syncs must keep memory flat."""
+    monitor = MemoryMonitor(snapshot_every=10)
+
+    cfg = FakeConfig()
+
+    samples = _run_cycles(monitor, lambda: queue_sync.full_blossom_queue_sync(cfg))
+
+    check_memory_growth(samples, MEMORY_GROWTH_LIMIT_BYTES)
+    assert metrics.get_metrics()["memory_rss_bytes"] > 0
+
+
+def test_leak_fails_the_benchmark() -> None:
+    monitor = MemoryMonitor(snapshot_every=10)
+    leaked = []
+
+    samples = _run_cycles(monitor, lambda: leaked.append(bytearray(1024 * 1024)))
+
+    with pytest.raises(MemoryGrowthError):
+        check_memory_growth(samples, MEMORY_GROWTH_LIMIT_BYTES)
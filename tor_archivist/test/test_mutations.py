@@ -0,0 +1,143 @@
+import time
+from typing import Any, Dict, Optional
+
+import pytest
+from requests import Response, Session
+
+from tor_archivist.core.mutations import MutationBatcher
+from tor_archivist.core.records import BlossomSubmission
+from tor_archivist.test.fake_blossom import FakeBlossomServer
+
+
+class Blossom:
+    """The parts of the Blossom wrapper the batcher uses."""
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.http = Session()
+
+    def patch(self, path: str, data: Optional[Dict[str, Any]] = None) -> Response:
+        return self.http.patch(self.url + path, json=data)
+
+    def archive_submission(self, submission_id: int) -> Response:
+        return self.patch(f"submission/{submission_id}/archive")
+
+
+def _submission(b_id: int) -> BlossomSubmission:
+    return BlossomSubmission.from_json(
+        {"id": b_id, "tor_url": f"https://reddit.com/r/TranscribersOfReddit/comments/{b_id}/"}
+    )
+
+
+def _batcher(server: FakeBlossomServer, window: float = 60) -> MutationBatcher:
+    return MutationBatcher(Blossom(server.url), window=window, max_batch=100, concurrency=4)
+
+
+@pytest.mark.parametrize("bulk", [True, False])
+def test_results_are_mapped_to_each_submission(bulk: bool) -> None:
+    with FakeBlossomServer(bulk=bulk) as server:
+        server.missing_ids = {2}
+        batcher = _batcher(server)
+        submissions = [_submission(b_id) for b_id in (1, 2, 3)]
+        for b_submission in submissions:
+            batcher.submit("remove", b_submission)
+        batcher.submit("report", submissions[0], "Rule 3")
+
+        assert server.patches == []
+        results = batcher.flush()
+
+        assert results == {
+            ("remove", 1): True,
+            ("remove", 2): False,
+            ("remove", 3): True,
+            ("report", 1): True,
+        }
+        assert [b_submission.removed_from_queue for b_submission in submissions] == [
+            True,
+            False,
+            True,
+        ]
+        assert submissions[0].report_reason == "Rule 3"
+
+
+def test_bulk_endpoint_is_used_once_per_action() -> None:
+    with FakeBlossomServer() as server:
+        batcher = _batcher(server)
+        for b_id in range(1, 51):
+            batcher.submit("archive", _submission(b_id))
+        batcher.flush()
+
+        assert server.patches == [("submission/bulk/archive", {"ids": list(range(1, 51))})]
+
+
+def test_fallback_is_remembered() -> None:
+    with FakeBlossomServer(bulk=False) as server:
+        batcher = _batcher(server)
+        batcher.submit("approve", _submission(1))
+        batcher.flush()
+        batcher.submit("approve", _submission(2))
+        batcher.flush()
+
+        paths = [path for path, _ in server.patches]
+        assert paths == ["submission/bulk/approve", "submission/1/approve", "submission/2/approve"]
+
+
+def test_batch_is_sent_when_the_window_is_over() -> None:
+    with FakeBlossomServer() as server:
+        batcher = _batcher(server, window=0)
+        batcher.submit("nsfw", _submission(1))
+
+        assert len(server.patches) == 1
+        assert batcher.pending_count == 0
+
+
+def test_batch_is_sent_when_the_window_is_over_without_more_changes() -> None:
+    with FakeBlossomServer() as server:
+        batcher = _batcher(server, window=0.05)
+        b_submission = _submission(1)
+        batcher.submit("approve", b_submission)
+
+        deadline = time.monotonic() + 5
+        while not b_submission.approved and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert b_submission.approved
+        assert batcher.pending_count == 0
+
+
+def test_falls_back_when_the_bulk_answer_is_unexpected() -> None:
+    with FakeBlossomServer() as server:
+        server.bulk_body = ["not", "a", "dict"]
+        batcher = _batcher(server)
+        batcher.submit("remove", _submission(1))
+
+        assert batcher.flush() == {("remove", 1): True}
+        paths = [path for path, _ in server.patches]
+        assert paths == ["submission/bulk/remove", "submission/1/remove"]
+
+
+def test_falls_back_when_the_bulk_call_fails() -> None:
+    class FailingBulk(Blossom):
+        def patch(self, path: str, data: Optional[Dict[str, Any]] = None) -> Response:
+            if "/bulk/" in path:
+                raise ConnectionError("Connection reset")
+            return super().patch(path, data)
+
+    with FakeBlossomServer() as server:
+        batcher = MutationBatcher(FailingBulk(server.url), window=60, max_batch=100, concurrency=4)
+        batcher.submit("nsfw", _submission(1))
+        batcher.submit("nsfw", _submission(2))
+
+        assert batcher.flush() == {("nsfw", 1): True, ("nsfw", 2): True}
+
+
+def test_falls_back_when_the_bulk_call_is_answered_with_an_error() -> None:
+    with FakeBlossomServer() as server:
+        server.bulk_status = 500
+        batcher = _batcher(server)
+        batcher.submit("remove", _submission(1))
+
+        assert batcher.flush() == {("remove", 1): True}
+        paths = [path for path, _ in server.patches]
+        assert paths == ["submission/bulk/remove", "submission/1/remove"]
+        assert batcher.bulk_supported["remove"] is None
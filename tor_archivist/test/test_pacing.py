@@ -0,0 +1,49 @@
+import threading
+import time
+
+from tor_archivist.core.pacing import PacingController
+
+
+def _controller() -> PacingController:
+    return PacingController(min_interval=10, max_interval=60, backoff_base=5, backoff_max=100)
+
+
+def test_interval_shrinks_with_activity_and_recovers() -> None:
+    pacing = _controller()
+    assert pacing.next_interval() == 60
+
+    pacing.record_activity(4)
+    busy = pacing.next_interval()
+    assert 10 <= busy < 60
+
+    for _ in range(3):
+        pacing.record_activity(50)
+    assert pacing.next_interval() == 10
+
+    for _ in range(20):
+        pacing.record_activity(0)
+    assert pacing.next_interval() > 55
+
+
+def test_error_backoff_is_exponential_with_jitter() -> None:
+    pacing = _controller()
+    delays = [pacing.error_delay() for _ in range(8)]
+
+    for i, delay in enumerate(delays):
+        ceiling = min(100, 5 * 2**i)
+        assert ceiling / 2 <= delay <= ceiling
+
+    pacing.record_success()
+    assert pacing.error_delay() <= 5
+
+
+def test_wake_interrupts_wait() -> None:
+    pacing = _controller()
+    threading.Timer(0.05, pacing.wake).start()
+
+    start = time.monotonic()
+    assert pacing.wait(30) is True
+    assert time.monotonic() - start < 5
+
+    # The wake-up is used up, the next wait runs its course
+    assert pacing.wait(0.01) is False
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from tor_archivist.core.records import BlossomSubmission, SubmissionPage
+
+SUBMISSION = {
+    "id": 42,
+    "original_id": "abc123",
+    "create_time": "2021-06-01T12:00:00Z",
+    "claimed_by": None,
+    "url": "https://reddit.com/r/me_irl/comments/abc123/me_irl/",
+    "tor_url": "https://reddit.com/r/TranscribersOfReddit/comments/def456/me_irl/",
+    "content_url": "https://i.redd.it/abc.png",
+    "title": "me_irl",
+    "nsfw": True,
+    "removed_from_queue": False,
+    "cannot_ocr": False,
+}
+
+
+def test_record_keeps_only_used_fields() -> None:
+    record = BlossomSubmission.from_json(SUBMISSION)
+
+    assert record.id == 42
+    assert record.tor_url == SUBMISSION["tor_url"]
+    assert record.url == SUBMISSION["url"]
+    assert record.nsfw is True
+    assert record.removed_from_queue is False
+    assert record.report_reason is None
+    with pytest.raises(AttributeError):
+        record.title = "me_irl"
+
+
+def test_decode_paginated_page() -> None:
+    body = json.dumps(
+        {
+            "count": 3,
+            "next": "https://api.grafeas.org/api/submission/?page=2",
+            "previous": None,
+            "results": [dict(SUBMISSION, id=i) for i in range(2)],
+        },
+        indent=2,
+    )
+
+    page = SubmissionPage.decode(body)
+
+    assert [record.id for record in page.results] == [0, 1]
+    assert page.count == 3
+    assert page.next == "https://api.grafeas.org/api/submission/?page=2"
+
+
+def test_decode_plain_list_and_empty_page() -> None:
+    page = SubmissionPage.decode(json.dumps([SUBMISSION]))
+    assert [record.id for record in page.results] == [42]
+    assert page.next is None
+
+    page = SubmissionPage.decode('{"count": 0, "next": null, "results": []}')
+    assert page.results == []
+    assert page.count == 0
+
+
+def test_decode_rejects_garbage() -> None:
+    with pytest.raises(ValueError):
+        SubmissionPage.decode("<html>Bad Gateway</html>")
@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+from tor_archivist.core import STAGE_NAMES, runner
+from tor_archivist.core.config import Config
+from tor_archivist.core.pacing import PacingController
+
+
+def test_stage_registry_matches_stage_names() -> None:
+    assert tuple(runner.STAGES) == STAGE_NAMES
+
+
+def test_run_stages_runs_selected_stages_in_order(monkeypatch: pytest.MonkeyPatch) -> None:
+    ran = []
+    stages = {name: (lambda cfg, name=name: ran.append(name)) for name in STAGE_NAMES}
+
+    def broken(cfg: object) -> None:
+        ran.append("sync")
+        raise RuntimeError("Blossom is down")
+
+    stages["sync"] = broken
+    monkeypatch.setattr(runner, "STAGES", stages)
+
+    results = runner.run_stages(Config(), ["reports", "sync", "completed"])
+
+    assert ran == ["completed", "sync", "reports"]
+    assert [result.ok for result in results] == [True, False, True]
+    assert isinstance(results[1].error, RuntimeError)
+
+
+def test_noop_run_stops_waiting_when_woken() -> None:
+    cfg = Config()
+    cfg.pacing = PacingController(1, 60, 1, 60)
+    cfg.pacing.wake()
+
+    start = time.monotonic()
+    runner.run_noop(cfg)
+
+    assert time.monotonic() - start < 5
+
+
+def test_waking_without_events_keeps_the_schedule(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(runner, "run_stages", lambda cfg, stages: pytest.fail("Cycle started"))
+    cfg = Config()
+    cfg.pacing = PacingController(1, 60, 1, 60)
+    cfg.sleep_until = time.time() + 60
+    sleep_until = cfg.sleep_until
+    cfg.pacing.wake()
+
+    runner.run(cfg)
+
+    assert cfg.sleep_until == sleep_until
@@ -0,0 +1,47 @@
+from pathlib import Path
+
+from tor_archivist.core.sharding import ShardLeases, shard_for
+
+
+def test_shard_for_is_stable() -> None:
+    assert shard_for(1234, 8) == shard_for("1234", 8)
+    assert {shard_for(i, 8) for i in range(1000)} == set(range(8))
+
+
+def test_shards_are_partitioned_between_instances(tmp_path: Path) -> None:
+    lease_file = str(tmp_path / "leases.sqlite3")
+    first = ShardLeases(lease_file, 8, ttl=60, instance_id="first")
+    second = ShardLeases(lease_file, 8, ttl=60, instance_id="second")
+
+    assert first.renew(now=0) == set(range(8))
+    assert second.renew(now=1) == set()
+    # The first instance hands over its extra shards, the second one picks them up
+    first.renew(now=2)
+    second.renew(now=3)
+
+    assert len(first.owned) == len(second.owned) == 4
+    assert first.owned | second.owned == set(range(8))
+
+
+def test_shards_of_dead_instance_are_reassigned(tmp_path: Path) -> None:
+    lease_file = str(tmp_path / "leases.sqlite3")
+    first = ShardLeases(lease_file, 4, ttl=60, instance_id="first")
+    second = ShardLeases(lease_file, 4, ttl=60, instance_id="second")
+    first.renew(now=0)
+    second.renew(now=0)
+    first.renew(now=0)
+    second.renew(now=0)
+    assert len(second.owned) == 2
+
+    # The first instance stops renewing and its leases run out
+    assert second.renew(now=61) == set(range(4))
+
+
+def test_release_frees_shards(tmp_path: Path) -> None:
+    lease_file = str(tmp_path / "leases.sqlite3")
+    first = ShardLeases(lease_file, 4, ttl=60, instance_id="first")
+    second = ShardLeases(lease_file, 4, ttl=60, instance_id="second")
+    first.renew(now=0)
+    first.release()
+
+    assert second.renew(now=1) == set(range(4))
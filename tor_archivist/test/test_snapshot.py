@@ -0,0 +1,123 @@
+import json
+import time
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+from prawcore import Forbidden
+
+from tor_archivist import UPDATE_DELAY_SEC
+from tor_archivist.core import queue_sync, snapshot
+from tor_archivist.core.config import Config
+from tor_archivist.core.records import BlossomSubmission
+
+TOR_URL = "https://reddit.com/r/TranscribersOfReddit/comments/abc/"
+
+
+def _submission(b_id: int = 1, tor_url: str = TOR_URL) -> BlossomSubmission:
+    return BlossomSubmission(b_id, tor_url, url="https://reddit.com/r/me_irl/comments/xyz/")
+
+
+def test_snapshot_round_trip(tmp_path: Path) -> None:
+    path = str(tmp_path / "snapshot.json")
+    cfg = Config()
+    cfg.sleep_until = time.time() + 60
+    cfg.archive_run_step = 2
+    cfg.last_sync["sync"] = 1234.0
+    cfg.records.put(_submission())
+    cfg.private_subreddits["me_irl"] = time.time()
+    snapshot.save_snapshot(cfg, path)
+
+    restored = Config()
+    assert snapshot.load_snapshot(restored, path)
+
+    assert restored.sleep_until == cfg.sleep_until
+    assert restored.archive_run_step == pytest.approx(2, abs=10 / UPDATE_DELAY_SEC)
+    assert restored.last_sync == {"sync": 1234.0}
+    assert restored.records.get(TOR_URL).to_json() == _submission().to_json()
+    assert "me_irl" in restored.private_subreddits
+
+
+def test_downtime_counts_towards_the_archiving_run(tmp_path: Path) -> None:
+    path = tmp_path / "snapshot.json"
+    snapshot.save_snapshot(Config(), str(path))
+    data = json.loads(path.read_text())
+    data["archive_run_step"] = 0
+    data["written_at"] -= 3 * UPDATE_DELAY_SEC
+    path.write_text(json.dumps(data))
+
+    cfg = Config()
+    snapshot.load_snapshot(cfg, str(path))
+
+    assert cfg.archive_run_step == pytest.approx(3, abs=0.1)
+
+
+def test_expired_records_are_not_restored(tmp_path: Path) -> None:
+    path = str(tmp_path / "snapshot.json")
+    cfg = Config()
+    cfg.records.put(_submission(), cached_at=time.time() - cfg.records.ttl - 1)
+    cfg.records.put(_submission(2, TOR_URL + "2/"))
+    snapshot.save_snapshot(cfg, path)
+
+    restored = Config()
+    snapshot.load_snapshot(restored, path)
+
+    assert restored.records.get(TOR_URL) is None
+    assert restored.records.get(TOR_URL + "2/").id == 2
+
+
+@pytest.mark.parametrize("content", ["{not json", json.dumps({"version": 0})])
+def test_unusable_snapshot_means_cold_start(tmp_path: Path, content: str) -> None:
+    path = tmp_path / "snapshot.json"
+    path.write_text(content)
+    cfg = Config()
+
+    assert not snapshot.load_snapshot(cfg, str(path))
+    assert not snapshot.load_snapshot(cfg, str(tmp_path / "missing.json"))
+    assert cfg.sleep_until == 0
+
+
+class FakeResponse:
+    status_code = 403
+
+
+class FakePost:
+    removed_by_category = None
+    over_18 = False
+    url = "https://reddit.com/r/me_irl/comments/xyz/"
+
+
+class FakeReddit:
+    """Shows the partner post, unless the subreddit is private."""
+
+    def __init__(self, private: bool) -> None:
+        self.private = private
+        self.requested: List[str] = []
+
+    def submission(self, url: str) -> Any:
+        self.requested.append(url)
+        if self.private:
+            raise Forbidden(FakeResponse())
+        return FakePost()
+
+
+@pytest.mark.parametrize("private", [True, False])
+def test_known_private_subreddits_are_checked_again(
+    monkeypatch: pytest.MonkeyPatch, private: bool
+) -> None:
+    cfg = Config()
+    cfg.reddit = FakeReddit(private)
+    cfg.private_subreddits["me_irl"] = time.time()
+    removed = []
+    monkeypatch.setattr("tor_archivist.core.reddit.remove_on_reddit", removed.append)
+    monkeypatch.setattr(
+        "tor_archivist.core.reddit.remove_on_blossom", lambda cfg, b: removed.append(b)
+    )
+
+    handled, _ = queue_sync._auto_report_handling(cfg, FakePost(), _submission(), "Rule 1")
+
+    # Reddit is asked every time; the subreddit may be public again
+    assert cfg.reddit.requested == [FakePost.url]
+    assert handled == private
+    assert len(removed) == (2 if private else 0)
+    assert ("me_irl" in cfg.private_subreddits) == private
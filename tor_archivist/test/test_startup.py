@@ -0,0 +1,112 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# Generous, since CI machines are slow; importing praw alone blows through it.
+IMPORT_BUDGET_SEC = float(os.getenv("IMPORT_BUDGET_SEC", 0.5))
+HEAVY_MODULES = ["praw", "prawcore", "bugsnag", "blossom_wrapper", "shiv", "slackclient", "pytest"]
+
+_IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import tor_archivist.main
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def _import_main() -> dict:
+    # Run in a fresh interpreter; the test process has most things imported already.
+    # The path is passed along because inside the shiv zipapp the package only
+    # lives in the extracted site-packages.
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    result = subprocess.run(
+        [sys.executable, "-c", _IMPORT_SCRIPT], capture_output=True, check=True, env=env
+    )
+    return json.loads(result.stdout)
+
+
+def test_main_does_not_import_heavy_modules() -> None:
+    modules = _import_main()["modules"]
+    for name in HEAVY_MODULES:
+        assert name not in modules, f"{name} is imported eagerly by tor_archivist.main"
+
+
+def test_main_import_time_budget() -> None:
+    assert _import_main()["elapsed"] < IMPORT_BUDGET_SEC
+
+
+def test_user_info_is_cached(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from tor_archivist.core import initialize
+
+    calls = []
+
+    class FakeBlossom:
+        def get(self, path: str, params: dict) -> "FakeBlossom":
+            calls.append(params["username"])
+            return self
+
+        def json(self) -> dict:
+            return {"results": [{"id": 3, "username": calls[-1]}]}
+
+    class FakeConfig:
+        blossom = FakeBlossom()
+
+    monkeypatch.setattr(initialize, "USER_INFO_CACHE_FILE", str(tmp_path / "cache.json"))
+
+    assert initialize.get_user_info(FakeConfig(), "transcribot")["username"] == "transcribot"
+    assert initialize.get_user_info(FakeConfig(), "transcribot")["username"] == "transcribot"
+    assert calls == ["transcribot"]
+
+    monkeypatch.setattr(initialize, "USER_INFO_CACHE_TTL_SEC", 0)
+    initialize.get_user_info(FakeConfig(), "transcribot")
+    assert calls == ["transcribot", "transcribot"]
+
+
+@pytest.mark.parametrize("lease_shards", [True, False])
+def test_start_bot_builds_everything(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, lease_shards: bool
+) -> None:
+    """Run the whole startup against fakes, as far as it goes without the network."""
+    import praw
+    from requests import Session
+
+    from tor_archivist import main
+    from tor_archivist.core import config as config_module
+    from tor_archivist.core import initialize
+    from tor_archivist.core.config import Config
+
+    class FakeReddit:
+        def __init__(self, *args: str, **kwargs: dict) -> None:
+            self.kwargs = kwargs
+
+        def subreddit(self, name: str) -> str:
+            return name
+
+    class FakeBlossom:
+        http = Session()
+
+    cfg = Config()
+    monkeypatch.setattr(config_module, "config", cfg)
+    monkeypatch.setattr(initialize, "config", cfg)
+    monkeypatch.setattr(praw, "Reddit", FakeReddit)
+    monkeypatch.setattr(initialize, "configure_logging", lambda config: None)
+    monkeypatch.setattr(initialize, "get_blossom_connection", FakeBlossom)
+    monkeypatch.setattr(initialize, "get_user_info", lambda config, name="tor_archivist": {})
+    monkeypatch.setattr(initialize, "ARCHIVE_QUEUE_FILE", str(tmp_path / "queue.sqlite3"))
+    monkeypatch.setattr(initialize, "SHARD_COUNT", 4)
+    monkeypatch.setattr(initialize, "SHARD_LEASE_FILE", str(tmp_path / "leases.sqlite3"))
+
+    main.start_bot(debug=False, lease_shards=lease_shards)
+
+    assert cfg.reddit.kwargs["requestor_kwargs"]["limiter"] is cfg.limiters["reddit"]
+    assert cfg.archive_queue is not None
+    assert cfg.mutations is not None
+    assert cfg.pacing is not None
+    assert (cfg.archive, cfg.tor) == ("ToR_Archive", "TranscribersOfReddit")
+    # run-once doesn't take shards away from the daemons
+    assert (cfg.shards is not None) == lease_shards
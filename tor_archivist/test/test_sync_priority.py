@@ -0,0 +1,140 @@
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from tor_archivist.core import queue_sync
+from tor_archivist.core.config import Config
+from tor_archivist.core.records import BlossomSubmission
+from tor_archivist.core.sync_priority import SyncStats
+
+NOW = datetime(2021, 6, 1, 12, tzinfo=timezone.utc)
+MAX_AGE = 18 * 60 * 60
+
+
+def _submission(
+    b_id: int, subreddit: str = "me_irl", hours_old: float = 1, now: datetime = NOW
+) -> BlossomSubmission:
+    return BlossomSubmission(
+        b_id,
+        f"https://reddit.com/r/TranscribersOfReddit/comments/t{b_id}/",
+        url=f"https://reddit.com/r/{subreddit}/comments/p{b_id}/",
+        create_time=(now - timedelta(hours=hours_old)).isoformat().replace("+00:00", "Z"),
+    )
+
+
+def test_subreddits_with_many_removals_come_first() -> None:
+    stats = SyncStats(max_outcomes=100)
+    for i in range(10):
+        stats.record(_submission(100 + i, "risky"), changed=True)
+        stats.record(_submission(200 + i, "calm"), changed=False)
+
+    calm, risky, unknown = _submission(1, "calm"), _submission(2, "risky"), _submission(3, "new")
+
+    scores = [stats.score(b, NOW, MAX_AGE) for b in (risky, unknown, calm)]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_old_and_reported_posts_come_first() -> None:
+    stats = SyncStats(max_outcomes=100)
+    fresh, old, reported = _submission(1), _submission(2, hours_old=17), _submission(3)
+    stats.pending_reports = {reported.tor_url}
+
+    scores = [stats.score(b, NOW, MAX_AGE) for b in (reported, old, fresh)]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_previous_outcome_counts() -> None:
+    stats = SyncStats(max_outcomes=2)
+    changed, unknown, fine = _submission(1), _submission(2), _submission(3)
+    stats.record(changed, changed=True)
+    stats.record(fine, changed=False)
+    # Equal removal rates for all of them
+    stats.subreddits.clear()
+
+    scores = [stats.score(b, NOW, MAX_AGE) for b in (changed, unknown, fine)]
+    assert scores == sorted(scores, reverse=True)
+
+    stats.record(unknown, changed=False)
+    assert changed.tor_url not in stats.outcomes
+
+
+def test_stats_survive_a_json_round_trip() -> None:
+    stats = SyncStats(max_outcomes=100)
+    stats.record(_submission(1), changed=True)
+    stats.pending_reports = {"https://reddit.com/r/TranscribersOfReddit/comments/t2/"}
+
+    restored = SyncStats(max_outcomes=100)
+    restored.load_json(json.loads(json.dumps(stats.to_json())))
+
+    assert restored.to_json() == stats.to_json()
+
+
+class FakeResponse:
+    ok = True
+
+    def __init__(self, data: Any) -> None:
+        self.content = json.dumps(data).encode()
+
+
+class FakeBlossom:
+    def __init__(self, results: List[Dict]) -> None:
+        self.results = results
+
+    def get(self, path: str, params: Dict) -> FakeResponse:
+        return FakeResponse({"count": len(self.results), "next": None, "results": self.results})
+
+
+class FakeReddit:
+    def __init__(self) -> None:
+        self.synced: List[str] = []
+
+    def submission(self, url: str) -> str:
+        self.synced.append(url)
+        return url
+
+
+def test_full_sync_visits_the_riskiest_first(monkeypatch: Any) -> None:
+    now = datetime.now(tz=timezone.utc)
+    submissions = [_submission(1, now=now), _submission(2, hours_old=10, now=now)]
+    submissions.append(_submission(3, now=now))
+    cfg = Config()
+    cfg.blossom = FakeBlossom([b.to_json() for b in submissions])
+    cfg.reddit = FakeReddit()
+    cfg.sync_stats.pending_reports = {submissions[2].tor_url}
+    monkeypatch.setattr(
+        queue_sync, "_auto_report_handling", lambda *args: queue_sync.ReportHandling(False, False)
+    )
+
+    queue_sync.full_blossom_queue_sync(cfg)
+
+    assert cfg.reddit.synced == [submissions[i].tor_url for i in (2, 1, 0)]
+    assert cfg.sync_stats.outcomes[submissions[0].tor_url] == "ok"
+
+
+class NsfwPost:
+    """A post that is only marked as NSFW on the partner sub."""
+
+    def __init__(self, over_18: bool) -> None:
+        self.over_18 = over_18
+        self.removed_by_category = None
+        self.url = "https://reddit.com/r/me_irl/comments/p1/"
+
+
+class NsfwReddit:
+    def submission(self, url: str) -> NsfwPost:
+        # The partner post is NSFW, the ToR post isn't yet
+        return NsfwPost(over_18="me_irl" in url)
+
+
+def test_nsfw_changes_count_as_changed(monkeypatch: Any) -> None:
+    cfg = Config()
+    cfg.reddit = NsfwReddit()
+    marked: List[str] = []
+    monkeypatch.setattr(queue_sync, "nsfw_on_reddit", lambda r: marked.append("reddit"))
+    monkeypatch.setattr(queue_sync, "nsfw_on_blossom", lambda cfg, b: marked.append("blossom"))
+    b_submission = _submission(1)
+
+    assert queue_sync.sync_submission(cfg, b_submission)
+
+    assert marked == ["reddit", "blossom"]
+    assert cfg.sync_stats.outcomes[b_submission.tor_url] == "changed"
@@ -0,0 +1,157 @@
+import http.client
+import queue
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Tuple
+
+import pytest
+import requests
+
+from tor_archivist.core import runner
+from tor_archivist.core.config import Config
+from tor_archivist.core.records import BlossomSubmission
+from tor_archivist.core.webhook import WebhookReceiver
+
+TOR_URL = "https://reddit.com/r/TranscribersOfReddit/comments/abc/"
+
+
+@pytest.fixture
+def receiver() -> Iterator[WebhookReceiver]:
+    woken: List[bool] = []
+    receiver = WebhookReceiver("127.0.0.1", 0, "secret", 2, lambda: woken.append(True))
+    receiver.woken = woken
+    receiver.start()
+    yield receiver
+    receiver.stop()
+
+
+def _post(receiver: WebhookReceiver, body: Any, token: str = "secret") -> requests.Response:
+    host, port = receiver.server_address[:2]
+    return requests.post(
+        f"http://{host}:{port}/events", json=body, headers={"X-Webhook-Token": token}
+    )
+
+
+def test_events_are_queued_and_wake_the_loop(receiver: WebhookReceiver) -> None:
+    response = _post(receiver, {"event": "completed", "submission_id": 1})
+
+    assert response.status_code == 202
+    assert receiver.woken == [True]
+    event = receiver.next_event()
+    assert (event.kind, event.submission_id, event.submission) == ("completed", 1, None)
+    assert receiver.next_event() is None
+
+
+def test_whole_submissions_are_accepted(receiver: WebhookReceiver) -> None:
+    body = {"event": "reported", "submission": {"id": 2, "tor_url": TOR_URL}, "reason": "Rule 3"}
+    assert _post(receiver, body).status_code == 202
+
+    event = receiver.next_event()
+    assert event.submission.tor_url == TOR_URL
+    assert event.reason == "Rule 3"
+
+
+def test_invalid_requests_are_rejected(receiver: WebhookReceiver) -> None:
+    assert _post(receiver, {"event": "completed", "submission_id": 1}, "wrong").status_code == 401
+    assert _post(receiver, {"event": "deleted", "submission_id": 1}).status_code == 400
+    assert _post(receiver, {"event": "completed"}).status_code == 400
+    assert _post(receiver, {"event": "reported", "submission": {"id": 1}}).status_code == 400
+    assert not receiver.pending()
+
+
+@pytest.mark.parametrize("length", ["abc", "-1"])
+def test_invalid_content_length_is_rejected(receiver: WebhookReceiver, length: str) -> None:
+    host, port = receiver.server_address[:2]
+    connection = http.client.HTTPConnection(host, port, timeout=5)
+    connection.putrequest("POST", "/events")
+    connection.putheader("X-Webhook-Token", "secret")
+    connection.putheader("Content-Length", length)
+    connection.endheaders()
+
+    assert connection.getresponse().status == 400
+    connection.close()
+
+
+def test_duplicates_are_dropped_and_the_queue_is_bounded(receiver: WebhookReceiver) -> None:
+    for _ in range(2):
+        assert _post(receiver, {"event": "completed", "submission_id": 1}).status_code == 202
+    assert _post(receiver, {"event": "expired", "submission_id": 1}).status_code == 202
+    assert _post(receiver, {"event": "expired", "submission_id": 2}).status_code == 503
+
+    assert receiver.events.qsize() == 2
+
+
+class FakeMutations:
+    def __init__(self) -> None:
+        self.flushed = 0
+
+    def flush(self) -> None:
+        self.flushed += 1
+
+
+def _handle_events(
+    receiver: WebhookReceiver,
+    monkeypatch: pytest.MonkeyPatch,
+    in_blossom: Dict[int, BlossomSubmission],
+) -> Tuple[Config, List[Tuple[str, int, str]]]:
+    """Handle the queued events against the given Blossom submissions."""
+    handled: List[Tuple[str, int, str]] = []
+    for kind in runner.WEBHOOK_HANDLERS:
+        monkeypatch.setitem(
+            runner.WEBHOOK_HANDLERS,
+            kind,
+            lambda cfg, b, event: handled.append((event.kind, b.id, b.tor_url)),
+        )
+    monkeypatch.setattr(
+        runner, "get_blossom_submission_by_id", lambda cfg, b_id: in_blossom.get(b_id)
+    )
+    monkeypatch.setattr(runner, "drain_archive_queue", lambda cfg: None)
+    cfg = Config()
+    cfg.webhook = receiver
+    cfg.mutations = FakeMutations()
+    runner.handle_webhook_events(cfg)
+    return cfg, handled
+
+
+def _hours_ago(hours: float) -> str:
+    return (datetime.now(tz=timezone.utc) - timedelta(hours=hours)).isoformat()
+
+
+def test_events_are_handled_per_submission(
+    receiver: WebhookReceiver, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    in_blossom = {
+        b_id: BlossomSubmission(b_id, TOR_URL, completed_by="/api/volunteer/1/") for b_id in (1, 2)
+    }
+
+    _post(receiver, {"event": "completed", "submission_id": 1})
+    # The submission in the body is only used for its ID
+    _post(receiver, {"event": "completed", "submission": {"id": 2, "tor_url": "https://x/"}})
+    cfg, handled = _handle_events(receiver, monkeypatch, in_blossom)
+
+    assert handled == [("completed", 1, TOR_URL), ("completed", 2, TOR_URL)]
+    assert cfg.mutations.flushed == 1
+
+
+def test_events_not_matching_blossom_are_ignored(
+    receiver: WebhookReceiver, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    receiver.events = queue.Queue()
+    in_blossom = {
+        1: BlossomSubmission(1, TOR_URL, create_time=_hours_ago(1)),
+        2: BlossomSubmission(2, TOR_URL, create_time=_hours_ago(20)),
+        3: BlossomSubmission(3, TOR_URL, completed_by="/api/volunteer/1/", archived=True),
+        4: BlossomSubmission(4, TOR_URL),
+    }
+
+    for body in [
+        {"event": "expired", "submission_id": 1},
+        {"event": "expired", "submission_id": 2},
+        {"event": "completed", "submission_id": 3},
+        {"event": "completed", "submission_id": 4},
+    ]:
+        assert _post(receiver, body).status_code == 202
+    cfg, handled = _handle_events(receiver, monkeypatch, in_blossom)
+
+    # A fresh post isn't expired, and a post has to be completed and not
+    # archived yet to be archived
+    assert handled == [("expired", 2, TOR_URL)]